@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from .profiling import slow_requests
+
+
+def slow_requests_view(request):
+    if request.method == 'POST':
+        slow_requests.clear()
+        return redirect(request.path)
+    return TemplateResponse(request, 'admin/api/slow_requests.html', {
+        **admin.site.each_context(request),
+        'title': 'Медленные запросы',
+        'entries': slow_requests.entries(),
+    })
@@ -0,0 +1,114 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.translation import gettext as _
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+
+from .recipe_collections import COLLECTIONS, change_collection
+
+# Асинхронные версии эндпоинтов, которые упираются только в базу данных.
+# Под backend.asgi они не занимают поток на время ожидания запросов,
+# под WSGI Django выполняет их через async_to_sync.
+
+
+def json_response(data, status=status.HTTP_200_OK, **kwargs):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False},
+        **kwargs
+    )
+
+
+def error_response(exception):
+    response = json_response(
+        {'detail': str(exception.detail)}, status=exception.status_code
+    )
+    if response.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def api_view(methods):
+    # Декораторы csrf_exempt и require_http_methods в Django 4.2
+    # не поддерживают асинхронные представления.
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error_response(
+                    exceptions.MethodNotAllowed(request.method)
+                )
+                response['Allow'] = ', '.join(methods)
+                return response
+            return await view(request, *args, **kwargs)
+
+        # Аутентификация по токену, сессионные cookie не используются.
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def authenticate(request):
+    # Повторяет TokenAuthentication из DRF: заголовок «Token <ключ>».
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        raise exceptions.NotAuthenticated
+    if len(header) != 2:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. No credentials provided.')
+        )
+    token = await Token.objects.select_related('user').filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    return token.user
+
+
+toggle = sync_to_async(change_collection)
+
+
+async def toggle_collection(request, recipe_id, model):
+    try:
+        user = await authenticate(request)
+    except exceptions.APIException as error:
+        return error_response(error)
+    add = request.method == 'POST'
+    changed = (await toggle(model, user.id, [recipe_id], add)).get(recipe_id)
+    _, accusative, prepositional = COLLECTIONS[model]
+    if changed is None or not (add or changed):
+        return error_response(exceptions.NotFound())
+    if not changed:
+        return json_response(
+            {'detail': f'Рецепт уже находится в {prepositional}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if add:
+        return json_response(
+            {'detail': f'Рецепт добавлен в {accusative}.'},
+            status=status.HTTP_201_CREATED
+        )
+    return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST', 'DELETE'])
+async def favorite(request, recipe_id):
+    return await toggle_collection(request, recipe_id, FavoriteRecipe)
+
+
+@api_view(['POST', 'DELETE'])
+async def shopping_cart(request, recipe_id):
+    return await toggle_collection(request, recipe_id, ShoppingCart)
+
+
+@api_view(['GET'])
+async def short_link(request, recipe_id):
+    if not await Recipe.objects.filter(pk=recipe_id).aexists():
+        return error_response(exceptions.NotFound())
+    return json_response({'short_link': request.build_absolute_uri(reverse(
+        'recipe_redirect', kwargs={'recipe_id': recipe_id}
+    ))})
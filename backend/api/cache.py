@@ -0,0 +1,107 @@
+import json
+from hashlib import md5
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import CACHE_REQUESTS
+
+VERSION_KEY_PREFIX = 'response-version'
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def bump_versions(*scopes):
+    get_response_cache().set_many(
+        {f'{VERSION_KEY_PREFIX}:{scope}': uuid4().hex for scope in scopes},
+        timeout=None
+    )
+
+
+def get_versions(scopes):
+    cache = get_response_cache()
+    keys = [f'{VERSION_KEY_PREFIX}:{scope}' for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+class ResponseCacheMixin:
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in sorted(values)
+        ))
+        # В ответе абсолютные ссылки (пагинация, картинки), поэтому
+        # схема и хост входят в ключ.
+        return 'response:' + md5(':'.join([
+            request.scheme, request.get_host(), self.basename, self.action,
+            str(self.kwargs.get(self.lookup_field)), query,
+            *get_versions(self.get_cache_scopes()),
+        ]).encode()).hexdigest()
+
+    def is_cacheable(self, request):
+        return (
+            settings.RESPONSE_CACHE_TIMEOUT
+            and request.method == 'GET'
+            and self.action in self.cached_actions
+            and not request.user.is_authenticated
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        etag = getattr(self, 'response_etag', None)
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    def dispatch_cached(self, request, handler, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        cache = get_response_cache()
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        CACHE_REQUESTS.labels(
+            self.basename, 'miss' if cached is None else 'hit'
+        ).inc()
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (
+                '"{}"'.format(md5(json.dumps(
+                    response.data, cls=JSONEncoder, sort_keys=True
+                ).encode()).hexdigest()),
+                response.data,
+            )
+            cache.set(key, cached, settings.RESPONSE_CACHE_TIMEOUT)
+        self.response_etag, data = cached
+        if self.response_etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.dispatch_cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.dispatch_cached(
+            request, super().retrieve, *args, **kwargs
+        )
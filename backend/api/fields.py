@@ -0,0 +1,50 @@
+import binascii
+from base64 import b64decode
+
+import filetype
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile
+)
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.fields import ImageField
+
+DECODE_CHUNK_SIZE = 4 * 64 * 1024
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        _, _, base64_data = base64_data.rpartition(';base64,')
+        size = len(base64_data) * 3 // 4
+        if size > settings.IMAGE_MAX_UPLOAD_SIZE:
+            raise ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} МБ.'
+            )
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile(
+                self.get_file_name(None), None, size, None
+            )
+        else:
+            upload = SimpleUploadedFile(self.get_file_name(None), b'')
+        try:
+            for start in range(0, len(base64_data), DECODE_CHUNK_SIZE):
+                upload.file.write(b64decode(
+                    base64_data[start:start + DECODE_CHUNK_SIZE],
+                    validate=True
+                ))
+        except (binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        upload.size = upload.file.tell()
+        upload.file.seek(0)
+        extension = filetype.guess_extension(upload.file.read(262))
+        upload.file.seek(0)
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        upload.name = f'{upload.name}.{extension}'
+        return ImageField.to_internal_value(self, upload)
@@ -1,11 +1,35 @@
 import django_filters
-from recipes.models import Recipe
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Value
+from django.db.models.functions import Lower, StrIndex
+from recipes.models import SEARCH_CONFIG, Ingredient, Recipe
+
+
+class IngredientFilter(django_filters.FilterSet):
+    name = django_filters.CharFilter(method='filter_name')
+
+    class Meta:
+        model = Ingredient
+        fields = ['name']
+
+    def filter_name(self, ingredients, name, value):
+        value = value.lower()
+        ingredients = ingredients.annotate(name_lower=Lower('name'))
+        prefix_matches = ingredients.filter(name_lower__startswith=value)
+        if prefix_matches.exists():
+            return prefix_matches.order_by('name_lower')
+        return ingredients.filter(
+            name_lower__contains=value
+        ).annotate(
+            position=StrIndex('name_lower', Value(value))
+        ).order_by('position', 'name_lower')
 
 class RecipeFilter(django_filters.FilterSet):
     is_favorited = django_filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -14,11 +38,19 @@ class RecipeFilter(django_filters.FilterSet):
     def filter_is_favorited(self, recipes, name, value):
         user = self.request.user
         if user.is_authenticated and value:
-            return recipes.filter(favorited_by__user=user)
+            return recipes.filter(is_favorited=True)
         return recipes
 
     def filter_is_in_shopping_cart(self, recipes, name, value):
         user = self.request.user
         if user.is_authenticated and value:
-            return recipes.filter(in_shopping_cart__user=user)
+            return recipes.filter(is_in_shopping_cart=True)
         return recipes
+
+    def filter_search(self, recipes, name, value):
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return recipes.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-created_at')
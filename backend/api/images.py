@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+VARIANT_EXTENSION = VARIANT_FORMAT.lower().replace('jpeg', 'jpg')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants'
+)
+
+
+def delete_variants(storage, variants):
+    for path in (variants or {}).values():
+        storage.delete(path)
+
+
+def build_variants(model, pk, field_name):
+    close_old_connections()
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None:
+            return
+        file = getattr(instance, field_name)
+        if not file:
+            return
+        path = PurePosixPath(file.name)
+        old_variants = getattr(instance, f'{field_name}_variants')
+        variants = {}
+        with file.open('rb'), Image.open(file) as original:
+            original = ImageOps.exif_transpose(original).convert('RGB')
+            for name, size in settings.IMAGE_VARIANTS.items():
+                image = original.copy()
+                image.thumbnail(size, Image.LANCZOS)
+                content = BytesIO()
+                image.save(
+                    content, VARIANT_FORMAT, quality=settings.IMAGE_QUALITY
+                )
+                variants[name] = file.storage.save(
+                    str(path.parent / 'variants'
+                        / f'{path.stem}_{name}.{VARIANT_EXTENSION}'),
+                    ContentFile(content.getvalue())
+                )
+        if not model.objects.filter(
+            pk=pk, **{field_name: file.name}
+        ).update(**{f'{field_name}_variants': variants}):
+            # Картинку успели заменить или удалить: варианты не нужны.
+            delete_variants(file.storage, variants)
+            return
+        if model._meta.model_name == 'recipe':
+            bump_versions(
+                'recipes', f'recipe:{pk}', f'author:{instance.author_id}'
+            )
+        delete_variants(file.storage, {
+            name: old_path for name, old_path in old_variants.items()
+            if old_path not in variants.values()
+        })
+    except Exception:
+        # Задача выполняется в пуле потоков, и без записи в лог
+        # ошибка потерялась бы вместе с результатом.
+        logger.exception(
+            'Не удалось построить варианты %s.%s для %s',
+            model._meta.label, field_name, pk
+        )
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instance, field_name):
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(
+        lambda: executor.submit(build_variants, model, pk, field_name)
+    )
+
+
+def get_variant_urls(request, field, variants):
+    return {
+        name: request.build_absolute_uri(field.storage.url(path))
+        for name, path in (variants or {}).items()
+    }
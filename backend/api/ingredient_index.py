@@ -0,0 +1,57 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _load(self):
+        rows = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        return (
+            monotonic() + settings.INGREDIENT_INDEX_TIMEOUT,
+            [row[0] for row in rows],
+            rows,
+        )
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] < monotonic():
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot[0] < monotonic():
+                    snapshot = self._snapshot = self._load()
+        return snapshot
+
+    def search(self, query):
+        _, keys, rows = self._get_snapshot()
+        query = query.lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_UPPER_BOUND, start)
+        matches = rows[start:end] or sorted(
+            (row for row in rows if query in row[0]),
+            key=lambda row: (row[0].find(query), row[0])
+        )
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in matches
+        ]
+
+
+ingredient_index = IngredientIndex()
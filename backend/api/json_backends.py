@@ -0,0 +1,89 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.json import strict_constant
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Кодирование и разбор JSON для API. Библиотека выбирается настройкой
+# JSON_BACKEND: orjson, ujson или json; auto — первая установленная.
+# Типы, которых библиотека не знает (Decimal, ленивые строки, QuerySet),
+# кодируются так же, как в JSONEncoder из DRF. Результат совпадает
+# с JSONRenderer, кроме float: orjson пишет 1e16 вместо 1e+16, а NaN
+# и Infinity — как null, тогда как JSONRenderer их отвергает. Данные,
+# которые библиотека закодировать не может (например, целые длиннее
+# 64 бит), кодируются через json.
+
+encoder = JSONEncoder()
+
+
+def json_dumps(data):
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False,
+        separators=(',', ':')
+    ).encode()
+
+
+def json_loads(content):
+    # NaN и Infinity отвергаются, как в JSONParser и orjson.
+    return json.loads(content, parse_constant=strict_constant)
+
+
+def orjson_dumps(data):
+    # OPT_UTC_Z пишет UTC как «Z», как DRF.
+    try:
+        return orjson.dumps(
+            data, default=encoder.default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+    except orjson.JSONEncodeError:
+        return json_dumps(data)
+
+
+def ujson_dumps(data):
+    try:
+        return ujson.dumps(
+            data, ensure_ascii=False, escape_forward_slashes=False,
+            reject_bytes=False, default=encoder.default
+        ).encode()
+    except OverflowError:
+        return json_dumps(data)
+
+
+BACKENDS = {
+    'orjson': (orjson_dumps, orjson and orjson.loads, orjson),
+    'ujson': (ujson_dumps, ujson and ujson.loads, ujson),
+    'json': (json_dumps, json_loads, json),
+}
+
+
+def get_backend():
+    name = settings.JSON_BACKEND
+    if name == 'auto':
+        name = next(name for name, (*_, module) in BACKENDS.items() if module)
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'JSON_BACKEND должен быть одним из: auto, {", ".join(BACKENDS)}.'
+        )
+    dumps, loads, module = BACKENDS[name]
+    if module is None:
+        raise ImproperlyConfigured(f'Библиотека {name} не установлена.')
+    return dumps, loads
+
+
+def dumps(data):
+    return get_backend()[0](data)
+
+
+def loads(content):
+    return get_backend()[1](content)
@@ -0,0 +1,163 @@
+import os
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+    Histogram, generate_latest, multiprocess,
+)
+
+# В режиме нескольких воркеров (gunicorn) prometheus_client пишет значения
+# в mmap-файлы каталога PROMETHEUS_MULTIPROC_DIR, а /metrics их суммирует.
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    ['view', 'action', 'method'],
+)
+REQUESTS = Counter(
+    'foodgram_requests_total',
+    'Число обработанных запросов',
+    ['view', 'action', 'method', 'status'],
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'Число SQL-запросов',
+    ['view', 'action', 'database'],
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_response_cache_requests_total',
+    'Обращения к кешу ответов',
+    ['view', 'result'],
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа',
+    ['view', 'action'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, float('inf')),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'foodgram_db_pool_connections',
+    'Соединения пула по состоянию',
+    ['database', 'state'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_WAIT = Histogram(
+    'foodgram_db_pool_wait_seconds',
+    'Ожидание свободного соединения в пуле',
+    ['database'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, float('inf')),
+)
+DB_POOL_TIMEOUTS = Counter(
+    'foodgram_db_pool_timeouts_total',
+    'Запросы, не дождавшиеся соединения из пула',
+    ['database'],
+)
+# Размеры ответов считаются только для этих действий: остальные
+# эндпоинты небольшие и лишь раздули бы число временных рядов.
+MEASURED_ACTIONS = ('download_shopping_list', 'list_subscriptions')
+
+
+def get_view_labels(view_func):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}', None
+    return view_class.__name__, getattr(view_func, 'actions', None)
+
+
+class QueryCounter:
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(counters):
+    with ExitStack() as stack:
+        for counter in counters:
+            stack.enter_context(
+                connections[counter.alias].execute_wrapper(counter)
+            )
+        yield
+
+
+def count_streamed(content, labels):
+    size = 0
+    for chunk in content:
+        size += len(chunk)
+        yield chunk
+    RESPONSE_SIZE.labels(*labels).observe(size)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.metrics_labels = ('unresolved', '')
+        counters = [QueryCounter(alias) for alias in connections]
+        started = perf_counter()
+        with count_queries(counters):
+            response = self.get_response(request)
+        return self.observe(request, response, counters, started)
+
+    async def __acall__(self, request):
+        request.metrics_labels = ('unresolved', '')
+        counters = [QueryCounter(alias) for alias in connections]
+        started = perf_counter()
+        with count_queries(counters):
+            response = await self.get_response(request)
+        return self.observe(request, response, counters, started)
+
+    def observe(self, request, response, counters, started):
+        labels = request.metrics_labels
+        REQUEST_LATENCY.labels(*labels, request.method).observe(
+            perf_counter() - started
+        )
+        REQUESTS.labels(
+            *labels, request.method, response.status_code
+        ).inc()
+        for counter in counters:
+            if counter.count:
+                DB_QUERIES.labels(*labels, counter.alias).inc(counter.count)
+        if labels[1] in MEASURED_ACTIONS:
+            if response.streaming:
+                response.streaming_content = count_streamed(
+                    response.streaming_content, labels
+                )
+            else:
+                RESPONSE_SIZE.labels(*labels).observe(len(response.content))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view, actions = get_view_labels(view_func)
+        action = actions.get(request.method.lower(), '') if actions else ''
+        request.metrics_labels = (view, action)
+
+
+def metrics_view(request):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
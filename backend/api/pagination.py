@@ -1,6 +1,114 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 6
+
+
+class RecipeFeedPagination(LimitPagination):
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordered_cursor_message = (
+        'Курсор листает рецепты только от новых к старым '
+        'и не сочетается с поиском.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        if queryset.query.order_by:
+            # Курсор хранит дату и id последнего рецепта, поэтому
+            # продолжить выдачу в другом порядке, например по
+            # релевантности поиска, он не может.
+            raise ValidationError(
+                {self.cursor_query_param: self.ordered_cursor_message}
+            )
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at)
+                & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+            )
+        page = list(queryset.order_by('-created_at', '-pk')[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(*self.get_position(self.page[-1]))
+        )
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        return None
+
+    def get_position(self, recipe):
+        if isinstance(recipe, dict):
+            return recipe['created_at'], recipe['id']
+        return recipe.created_at, recipe.pk
+
+    def encode_cursor(self, created_at, pk):
+        return b64encode(
+            f'{created_at.isoformat()}|{pk}'.encode(), altchars=b'-_'
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, pk = b64decode(
+                cursor.encode(), altchars=b'-_', validate=True
+            ).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+
+class SubscriptionFeedPagination(RecipeFeedPagination):
+    # Лента подписок листается только курсором. Вместо queryset получает
+    # функцию feed(after, limit), возвращающую пары (id рецепта, created_at).
+    def paginate_queryset(self, feed, request, view=None):
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        page = feed(self.decode_cursor(cursor) if cursor else None,
+                    page_size + 1)
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_position(self, entry):
+        recipe_id, created_at = entry
+        return created_at, recipe_id
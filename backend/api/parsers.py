@@ -0,0 +1,17 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .json_backends import loads
+
+
+class FastJSONParser(JSONParser):
+    # JSON всегда в UTF-8 (RFC 8259), поэтому тело разбирается целиком
+    # без перекодирования. Другие кодировки разбирает JSONParser.
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
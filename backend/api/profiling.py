@@ -0,0 +1,179 @@
+import heapq
+import json
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from itertools import count
+from threading import Lock
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBERS = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    sql = PLACEHOLDERS.sub('(%s...)', sql)
+    return SPACES.sub(' ', NUMBERS.sub('?', sql)).strip()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @contextmanager
+    def serializing(self):
+        # Вложенные сериализаторы не учитываются повторно.
+        self._serializer_depth += 1
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._serializer_depth -= 1
+            if not self._serializer_depth:
+                self.serializer_time += perf_counter() - started
+
+    @property
+    def duplicates(self):
+        return {
+            sql: number for sql, number in self.fingerprints.items()
+            if number > 1
+        }
+
+
+class SlowRequestLog:
+    # Хранит самые медленные запросы процесса: куча ограниченного размера,
+    # вытесняется самый быстрый из сохранённых.
+    def __init__(self):
+        self._lock = Lock()
+        self._heap = []
+        self._counter = count()
+
+    def add(self, entry):
+        item = (entry['total_ms'], next(self._counter), entry)
+        with self._lock:
+            if len(self._heap) < settings.REQUEST_PROFILING_BUFFER_SIZE:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:
+                heapq.heapreplace(self._heap, item)
+
+    def entries(self):
+        with self._lock:
+            items = sorted(self._heap, reverse=True)
+        return [entry for *_, entry in items]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+
+slow_requests = SlowRequestLog()
+
+
+@contextmanager
+def profile_connections(profile):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        yield
+
+
+def profile_serializer_data():
+    # Подменяет BaseSerializer.data, только когда профилирование включено.
+    data = BaseSerializer.data
+
+    def profiled_data(self):
+        profile = current_profile.get()
+        if profile is None:
+            return data.fget(self)
+        with profile.serializing():
+            return data.fget(self)
+
+    BaseSerializer.data = property(profiled_data)
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = perf_counter()
+        try:
+            with profile_connections(profile):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = perf_counter()
+        try:
+            with profile_connections(profile):
+                response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile, started)
+
+    def report(self, request, response, profile, started):
+        total = perf_counter() - started
+        duplicates = profile.duplicates
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={profile.sql_time * 1000:.1f};'
+            f'desc="{profile.queries} queries"',
+            f'serializer;dur={profile.serializer_time * 1000:.1f}',
+            f'dup;desc="{sum(duplicates.values())} duplicate queries"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        entry = {
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'queries': profile.queries,
+            'sql_ms': round(profile.sql_time * 1000, 1),
+            'serializer_ms': round(profile.serializer_time * 1000, 1),
+            'duplicates': duplicates,
+        }
+        logger.info(json.dumps(entry, ensure_ascii=False))
+        slow_requests.add(entry)
+        return response
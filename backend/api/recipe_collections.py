@@ -0,0 +1,54 @@
+from django.db import connections, router
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+
+# Избранное и список покупок: добавление и удаление сразу нескольких
+# рецептов одной командой вместе с пересчётом счётчиков.
+
+COLLECTIONS = {
+    FavoriteRecipe: ('favorites_count', 'избранное', 'избранном'),
+    ShoppingCart: ('shopping_cart_count', 'список покупок', 'списке покупок'),
+}
+
+
+def build_change_sql(model, add):
+    # Вставка (или удаление) связей, пересчёт счётчиков рецептов и проверка
+    # существования рецептов. Возвращает строки (id рецепта, изменён ли)
+    # только для существующих рецептов.
+    table = model._meta.db_table
+    recipes = Recipe._meta.db_table
+    counter = COLLECTIONS[model][0]
+    if add:
+        change = f"""
+            INSERT INTO {table} (user_id, recipe_id)
+            SELECT %(user_id)s, id FROM {recipes}
+            WHERE id = ANY(%(recipe_ids)s)
+            ON CONFLICT DO NOTHING
+            RETURNING recipe_id
+        """
+    else:
+        change = f"""
+            DELETE FROM {table}
+            WHERE user_id = %(user_id)s AND recipe_id = ANY(%(recipe_ids)s)
+            RETURNING recipe_id
+        """
+    return f"""
+        WITH changed AS ({change}),
+        counted AS (
+            UPDATE {recipes} SET {counter} = {counter} {'+' if add else '-'} 1
+            WHERE id IN (SELECT recipe_id FROM changed)
+            {'' if add else f'AND {counter} >= 1'}
+        )
+        SELECT id, id IN (SELECT recipe_id FROM changed)
+        FROM {recipes} WHERE id = ANY(%(recipe_ids)s)
+    """
+
+
+def change_collection(model, user_id, recipe_ids, add):
+    using = router.db_for_write(model)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            build_change_sql(model, add),
+            {'user_id': user_id, 'recipe_ids': list(recipe_ids)},
+        )
+        return dict(cursor.fetchall())
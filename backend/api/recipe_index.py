@@ -0,0 +1,373 @@
+import logging
+from array import array
+from bisect import bisect_left
+from copy import copy
+from datetime import timedelta
+from threading import Lock, Thread
+from time import monotonic
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeIngredient, RemovedRecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+def to_bitmap(recipe_ids):
+    if not recipe_ids:
+        return 0
+    bits = bytearray((recipe_ids[-1] >> 3) + 1)
+    for recipe_id in recipe_ids:
+        bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def is_dense(recipe_ids):
+    return len(recipe_ids) * 64 > recipe_ids[-1]
+
+
+class RankedRecipes:
+    # Уровни — битовые маски рецептов с одинаковым числом совпадений,
+    # от большего числа к меньшему; внутри уровня — от новых к старым.
+    def __init__(self, levels):
+        self.levels = levels
+        self.sizes = [level.bit_count() for level in levels]
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self))
+        recipe_ids = []
+        for level, size in zip(self.levels, self.sizes):
+            if start >= size:
+                start -= size
+                stop -= size
+                continue
+            if stop <= 0:
+                break
+            level = self.skip_highest(level, start)
+            for _ in range(min(stop, size) - start):
+                recipe_id = level.bit_length() - 1
+                recipe_ids.append(recipe_id)
+                level ^= 1 << recipe_id
+            stop -= size
+            start = 0
+        return recipe_ids
+
+    @staticmethod
+    def skip_highest(level, count):
+        if not count:
+            return level
+        low, high = 0, level.bit_length()
+        while low < high:
+            middle = (low + high) // 2
+            if (level >> middle).bit_count() <= count:
+                high = middle
+            else:
+                low = middle + 1
+        return level & ((1 << low) - 1)
+
+
+class IndexSnapshot:
+    # Постинги продуктов и размеры рецептов. Снимок собирается вне
+    # запросов и догоняет базу: удаления берутся из журнала
+    # RemovedRecipeIngredient, добавления — по id строк. Опубликованный
+    # снимок не меняется, догон строит изменённую копию.
+    #
+    # id выдаются при вставке, а видны строки после коммита, поэтому
+    # каждый догон заново читает последние RECIPE_INDEX_RESCAN_ROWS id
+    # строк и журнала. Строку пропустит только транзакция, после вставки
+    # в которой другие успели добавить больше строк; её подхватит
+    # следующая сборка через RECIPE_INDEX_TIMEOUT.
+    def __init__(self):
+        self.postings = {}
+        self.sizes = array('H')
+        self.size_masks = {}
+        self.high_water = 0
+        self.removed_high_water = 0
+        # id записей журнала из окна перечитывания, уже применённые.
+        self.applied_removals = frozenset()
+        self.copied_postings = set()
+        self.synced_at = monotonic()
+
+    def copy(self):
+        snapshot = copy(self)
+        snapshot.postings = dict(self.postings)
+        snapshot.sizes = array('H', self.sizes)
+        snapshot.size_masks = dict(self.size_masks)
+        snapshot.copied_postings = set()
+        return snapshot
+
+    def contains(self, recipe_id, ingredient_id):
+        postings = self.postings.get(ingredient_id)
+        if postings is None:
+            return False
+        if isinstance(postings, int):
+            return bool(postings >> recipe_id & 1)
+        position = bisect_left(postings, recipe_id)
+        return position < len(postings) and postings[position] == recipe_id
+
+    def own_postings(self, ingredient_id, postings):
+        # Массивы постингов общие с опубликованным снимком, поэтому
+        # перед изменением копируются.
+        if ingredient_id not in self.copied_postings:
+            postings = array('l', postings)
+            self.copied_postings.add(ingredient_id)
+        return postings
+
+    @classmethod
+    def build(cls):
+        snapshot = cls()
+        # Отметка журнала берётся до чтения строк: удаления, случившиеся
+        # во время чтения, применятся при первом догоне.
+        snapshot.removed_high_water = (
+            RemovedRecipeIngredient.objects.aggregate(Max('id'))['id__max']
+            or 0
+        )
+        postings = {}
+        sizes = {}
+        for pk, recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+            'id'
+        ).values_list(
+            'id', 'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000):
+            postings.setdefault(ingredient_id, array('l')).append(recipe_id)
+            sizes[recipe_id] = sizes.get(recipe_id, 0) + 1
+            snapshot.high_water = pk
+        for ingredient_id, recipe_ids in postings.items():
+            recipe_ids = array('l', sorted(recipe_ids))
+            snapshot.postings[ingredient_id] = (
+                to_bitmap(recipe_ids) if is_dense(recipe_ids) else recipe_ids
+            )
+        by_size = {}
+        for recipe_id, size in sizes.items():
+            by_size.setdefault(size, []).append(recipe_id)
+        snapshot.size_masks = {
+            size: to_bitmap(sorted(recipe_ids))
+            for size, recipe_ids in by_size.items()
+        }
+        if sizes:
+            snapshot.sizes.extend(bytes(max(sizes) + 1))
+        for recipe_id, size in sizes.items():
+            snapshot.sizes[recipe_id] = size
+        return snapshot
+
+    def set_size(self, recipe_id, size):
+        if recipe_id >= len(self.sizes):
+            self.sizes.extend(bytes(recipe_id - len(self.sizes) + 1))
+        bit = 1 << recipe_id
+        old_size = self.sizes[recipe_id]
+        if old_size:
+            self.size_masks[old_size] &= ~bit
+        if size:
+            self.size_masks[size] = self.size_masks.get(size, 0) | bit
+        self.sizes[recipe_id] = size
+
+    def get_size(self, recipe_id):
+        if recipe_id < len(self.sizes):
+            return self.sizes[recipe_id]
+        return 0
+
+    def add(self, recipe_id, ingredient_id):
+        postings = self.postings.get(ingredient_id, array('l'))
+        if isinstance(postings, int):
+            if postings >> recipe_id & 1:
+                return
+            postings |= 1 << recipe_id
+        else:
+            position = bisect_left(postings, recipe_id)
+            if position < len(postings) and postings[position] == recipe_id:
+                return
+            postings = self.own_postings(ingredient_id, postings)
+            postings.insert(position, recipe_id)
+            if is_dense(postings):
+                postings = to_bitmap(postings)
+        self.postings[ingredient_id] = postings
+        self.set_size(recipe_id, self.get_size(recipe_id) + 1)
+
+    def remove(self, recipe_id, ingredient_id):
+        postings = self.postings.get(ingredient_id)
+        if postings is None:
+            return
+        if isinstance(postings, int):
+            if not postings >> recipe_id & 1:
+                return
+            self.postings[ingredient_id] = postings & ~(1 << recipe_id)
+        else:
+            position = bisect_left(postings, recipe_id)
+            if position == len(postings) or postings[position] != recipe_id:
+                return
+            postings = self.own_postings(ingredient_id, postings)
+            del postings[position]
+            self.postings[ingredient_id] = postings
+        self.set_size(recipe_id, self.get_size(recipe_id) - 1)
+
+    def is_fresh(self):
+        # Догонять по журналу можно, пока из него не удалены записи,
+        # появившиеся после прошлого догона.
+        return (
+            monotonic() - self.synced_at
+            < settings.RECIPE_INDEX_LOG_RETENTION
+        )
+
+    def catch_up(self):
+        synced_at = monotonic()
+        rescan = settings.RECIPE_INDEX_RESCAN_ROWS
+        removed = [
+            row for row in RemovedRecipeIngredient.objects.filter(
+                id__gt=self.removed_high_water - rescan
+            ).order_by('id').values_list('id', 'recipe_id', 'ingredient_id')
+            if row[0] not in self.applied_removals
+        ]
+        touched = {recipe_id for _, recipe_id, _ in removed}
+        # Продукты затронутых рецептов перечитываются целиком: пара,
+        # удалённая и добавленная заново, остаётся в индексе.
+        rows = list(RecipeIngredient.objects.filter(
+            Q(id__gt=self.high_water - rescan) | Q(recipe_id__in=touched)
+        ).values_list('id', 'recipe_id', 'ingredient_id'))
+        if removed or any(
+            not self.contains(recipe_id, ingredient_id)
+            for _, recipe_id, ingredient_id in rows
+        ):
+            snapshot = self.copy()
+            for _, recipe_id, ingredient_id in removed:
+                snapshot.remove(recipe_id, ingredient_id)
+            for _, recipe_id, ingredient_id in rows:
+                snapshot.add(recipe_id, ingredient_id)
+        else:
+            snapshot = copy(self)
+        snapshot.high_water = max(
+            [self.high_water, *(pk for pk, _, _ in rows)]
+        )
+        snapshot.removed_high_water = max(
+            [self.removed_high_water, *(pk for pk, _, _ in removed)]
+        )
+        snapshot.applied_removals = frozenset(
+            pk
+            for pk in self.applied_removals.union(
+                pk for pk, _, _ in removed
+            )
+            if pk > snapshot.removed_high_water - rescan
+        )
+        snapshot.synced_at = synced_at
+        return snapshot
+
+    def search(self, ingredient_ids, covered):
+        candidates = 0
+        counters = []
+        for ingredient_id in set(ingredient_ids):
+            postings = self.postings.get(ingredient_id, 0)
+            carry = (
+                postings if isinstance(postings, int)
+                else to_bitmap(postings)
+            )
+            candidates |= carry
+            for position, counter in enumerate(counters):
+                if not carry:
+                    break
+                counters[position], carry = (
+                    counter ^ carry, counter & carry
+                )
+            if carry:
+                counters.append(carry)
+        levels = []
+        for matches in range((1 << len(counters)) - 1, 0, -1):
+            level = candidates
+            for position, counter in enumerate(counters):
+                level &= counter if matches >> position & 1 else ~counter
+            if covered:
+                level &= self.size_masks.get(matches, 0)
+            if level:
+                levels.append(level)
+        return RankedRecipes(levels)
+
+
+def search_database(ingredient_ids, covered=False):
+    # Тот же порядок, что у индекса: по числу совпадений, затем
+    # от новых к старым.
+    recipes = Recipe.objects.annotate(matches=Count(
+        'recipe_ingredients',
+        filter=Q(recipe_ingredients__ingredient_id__in=set(ingredient_ids))
+    )).filter(matches__gt=0)
+    if covered:
+        recipes = recipes.annotate(
+            size=Count('recipe_ingredients')
+        ).filter(size=F('matches'))
+    return recipes.order_by('-matches', '-id').values_list('id', flat=True)
+
+
+class RecipeIngredientIndex:
+    # Снимок пересобирается в фоновом потоке раз в RECIPE_INDEX_TIMEOUT
+    # и догоняет базу не чаще раза в RECIPE_INDEX_SYNC_INTERVAL. Сборка
+    # и догон идут без блокировки, под ней только подменяется ссылка,
+    # поэтому запросы ищут по текущему снимку, не дожидаясь базы.
+    # Пока снимка нет, ищет база.
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+        self._building = False
+        self._syncing = False
+        self._expires = 0
+
+    def rebuild(self):
+        snapshot = IndexSnapshot.build().catch_up()
+        RemovedRecipeIngredient.objects.filter(
+            removed_at__lt=timezone.now() - timedelta(
+                seconds=settings.RECIPE_INDEX_LOG_RETENTION
+            )
+        ).delete()
+        with self._lock:
+            self._snapshot = snapshot
+            self._expires = monotonic() + settings.RECIPE_INDEX_TIMEOUT
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Не удалось пересобрать индекс рецептов')
+        finally:
+            with self._lock:
+                self._building = False
+            connections.close_all()
+
+    def _get_snapshot(self):
+        with self._lock:
+            if self._expires < monotonic() and not self._building:
+                self._building = True
+                Thread(
+                    target=self._rebuild_in_background, daemon=True
+                ).start()
+            snapshot = self._snapshot
+            if snapshot is None or not snapshot.is_fresh():
+                return None
+            if self._syncing or (
+                monotonic() - snapshot.synced_at
+                < settings.RECIPE_INDEX_SYNC_INTERVAL
+            ):
+                return snapshot
+            self._syncing = True
+        try:
+            synced = snapshot.catch_up()
+        finally:
+            with self._lock:
+                self._syncing = False
+        with self._lock:
+            # Пока шёл догон, фоновая сборка могла подменить снимок.
+            if self._snapshot is snapshot:
+                self._snapshot = synced
+            return self._snapshot
+
+    def search(self, ingredient_ids, covered=False):
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return search_database(ingredient_ids, covered)
+        return snapshot.search(ingredient_ids, covered)
+
+
+recipe_index = RecipeIngredientIndex()
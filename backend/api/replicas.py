@@ -0,0 +1,97 @@
+import random
+from contextvars import ContextVar
+from hashlib import sha256
+from time import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import get_response_cache
+
+PRIMARY_COOKIE = 'primary_until'
+PRIMARY_KEY_PREFIX = 'primary-until'
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+class ReplicaRouter:
+    # Реплики используются только внутри безопасных HTTP-запросов;
+    # команды, сигналы и всё остальное читают с основной базы.
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_from_replica.set(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = read_from_replica.set(self.can_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_to_primary(request, response)
+
+    def get_pin_key(self, request):
+        # Клиенты с токеном часто не хранят cookie, поэтому их закрепляем
+        # по заголовку Authorization: пользователь на этом этапе ещё
+        # не определён, а токен однозначно его задаёт.
+        authorization = request.headers.get('Authorization')
+        if authorization:
+            return f'{PRIMARY_KEY_PREFIX}:' + sha256(
+                authorization.encode()
+            ).hexdigest()
+        return None
+
+    def can_use_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        key = self.get_pin_key(request)
+        if key and get_response_cache().get(key):
+            return False
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) <= time()
+        except ValueError:
+            return True
+
+    def pin_to_primary(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # После записи клиент читает с основной базы, пока реплики
+            # догоняют изменения: иначе is_favorited может устареть.
+            window = settings.DB_REPLICA_PIN_SECONDS
+            key = self.get_pin_key(request)
+            if key:
+                get_response_cache().set(key, True, window)
+            response.set_cookie(
+                PRIMARY_COOKIE, str(time() + window), max_age=window,
+                httponly=True, samesite='Lax',
+            )
+        return response
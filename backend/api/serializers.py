@@ -1,11 +1,16 @@
-from drf_extra_fields.fields import Base64ImageField
+from collections import Counter
+
 from rest_framework import serializers
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from recipes.models import (
-    Ingredient, Recipe, RecipeIngredient,
-    FavoriteRecipe, ShoppingCart
-)
+from recipes.feed import fan_out_recipes
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from .cache import bump_versions
+from .fields import StreamingBase64ImageField
+from .images import delete_variants, get_variant_urls, schedule_variants
 
 User = get_user_model()
 
@@ -28,61 +33,159 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class IngredientAmountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1)
+
+
+def validate_ingredients_exist(ingredient_ids):
+    ingredient_ids = set(ingredient_ids)
+    missing = ingredient_ids - set(Ingredient.objects.filter(
+        id__in=ingredient_ids
+    ).values_list('id', flat=True))
+    if missing:
+        raise serializers.ValidationError(
+            'Продукты не найдены: '
+            f'{", ".join(str(pk) for pk in sorted(missing))}.'
+        )
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     ingredients = RecipeIngredientSerializer(
         source='recipe_ingredients',
         many=True
     )
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-
-    def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return FavoriteRecipe.objects.filter(user=user, recipe=obj).exists()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
+    def get_image_variants(self, recipe):
+        return get_variant_urls(
+            self.context['request'], recipe.image, recipe.image_variants
+        )
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'author', 'name', 'image', 'text', 'ingredients', 
-            'cooking_time', 'created_at', 'is_favorited', 'is_in_shopping_cart'
+            'cooking_time', 'created_at', 'is_favorited',
+            'is_in_shopping_cart', 'favorites_count', 'image_variants'
         ]
 
 
+class RecipeBulkCreateSerializer(serializers.ListSerializer):
+    def validate(self, recipes):
+        validate_ingredients_exist(
+            ingredient['id']
+            for recipe in recipes
+            for ingredient in recipe['ingredients']
+        )
+        return recipes
+
+    @transaction.atomic
+    def create(self, validated_data):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(**{
+                field: value for field, value in recipe_data.items()
+                if field != 'ingredients'
+            })
+            for recipe_data in validated_data
+        ])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount']
+            )
+            for recipe, recipe_data in zip(recipes, validated_data)
+            for ingredient in recipe_data['ingredients']
+        ])
+        created_by_author = Counter(recipe.author_id for recipe in recipes)
+        for author_id, count in created_by_author.items():
+            User.objects.filter(pk=author_id).update(
+                recipes_count=F('recipes_count') + count
+            )
+        transaction.on_commit(lambda: bump_versions('recipes', *(
+            f'author:{author_id}' for author_id in created_by_author
+        )))
+        recipe_ids = [recipe.pk for recipe in recipes]
+        transaction.on_commit(lambda: fan_out_recipes(recipe_ids))
+        for recipe in recipes:
+            schedule_variants(recipe, 'image')
+        return recipes
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
-    ingredients = RecipeIngredientSerializer(many=True)
-    image = Base64ImageField()
+    ingredients = IngredientAmountSerializer(many=True)
+    image = StreamingBase64ImageField()
     cooking_time = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = Recipe
         fields = ('ingredients', 'image', 'name', 'text', 'cooking_time')
+        list_serializer_class = RecipeBulkCreateSerializer
     
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
         recipe = super().create(validated_data)
-        self._save_ingredients(recipe, ingredients_data)
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount']
+            )
+            for ingredient in ingredients_data
+        ])
+        schedule_variants(recipe, 'image')
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
+        ingredients_data = validated_data.pop('ingredients', None)
         recipe = super().update(instance, validated_data)
-        recipe.recipe_ingredients.all().delete()
-        self._save_ingredients(recipe, ingredients_data)
+        if ingredients_data is not None:
+            self._update_ingredients(recipe, ingredients_data)
+        if 'image' in validated_data:
+            schedule_variants(recipe, 'image')
         return recipe
 
-    def _save_ingredients(self, recipe, ingredients_data):
+    def to_representation(self, recipe):
+        return RecipeSerializer(
+            Recipe.objects.for_response(
+                self.context['request'].user
+            ).get(pk=recipe.pk),
+            context=self.context
+        ).data
+
+    def _update_ingredients(self, recipe, ingredients_data):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.recipe_ingredients.filter(
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
-                recipe=recipe,
-                ingredient_id=ingredient['id'],
-                amount=ingredient['amount']
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
-            for ingredient in ingredients_data
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
         ])
 
     def validate_ingredients(self, ingredients):
@@ -90,16 +193,39 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Рецепт должен содержать хотя бы один ингредиент.'
             )
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise serializers.ValidationError(
+                'Продукты в рецепте не должны повторяться.'
+            )
+        if not isinstance(self.parent, serializers.ListSerializer):
+            validate_ingredients_exist(ingredient_ids)
         return ingredients
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_COLLECTION_BULK_MAX_SIZE,
+    )
+
+    def validate_recipes(self, recipe_ids):
+        return list(dict.fromkeys(recipe_ids))
+
+
 class AvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=True)
+    avatar = StreamingBase64ImageField(required=True)
 
     class Meta:
         model = User
         fields = ['avatar']
 
+    def update(self, user, validated_data):
+        user = super().update(user, validated_data)
+        schedule_variants(user, 'avatar')
+        return user
+
     def validate_avatar(self, avatar):
         if not avatar:
             raise serializers.ValidationError('Поле "avatar" обязательно.')
@@ -107,11 +233,32 @@ class AvatarSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(DjoserUserSerializer):
-    avatar = Base64ImageField(required=False, allow_null=True)
+    avatar = StreamingBase64ImageField(required=False, allow_null=True)
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta(DjoserUserSerializer.Meta):
         model = User
-        fields = DjoserUserSerializer.Meta.fields + ('avatar',)
+        fields = DjoserUserSerializer.Meta.fields + (
+            'avatar', 'avatar_variants', 'recipes_count', 'subscribers_count'
+        )
+
+    def get_avatar_variants(self, user):
+        return get_variant_urls(
+            self.context['request'], user.avatar, user.avatar_variants
+        )
+
+    def update(self, user, validated_data):
+        if 'avatar' not in validated_data:
+            return super().update(user, validated_data)
+        # Аватар меняют и через PATCH /users/me/: миниатюры старого
+        # аватара удаляем, а для нового строим заново.
+        storage, variants = user.avatar.storage, user.avatar_variants
+        validated_data['avatar_variants'] = {}
+        user = super().update(user, validated_data)
+        transaction.on_commit(lambda: delete_variants(storage, variants))
+        if user.avatar:
+            schedule_variants(user, 'avatar')
+        return user
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
@@ -120,6 +267,14 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'image', 'cooking_time']
 
 
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return max(limit, 0)
+
+
 class AuthorSubscriptionSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.IntegerField(read_only=True)
@@ -131,10 +286,13 @@ class AuthorSubscriptionSerializer(serializers.ModelSerializer):
             'recipes', 'recipes_count', 'avatar'
         ]
 
-    def get_recipes(self, obj):
-        limit = int(self.context['request'].GET.get('recipes_limit', 10**10))
+    def get_recipes(self, author):
+        if 'recipes_by_author' in self.context:
+            recipes = self.context['recipes_by_author'].get(author.id, [])
+        else:
+            recipes = author.recipes.all()[:get_recipes_limit(
+                self.context['request']
+            )]
         return RecipeMinifiedSerializer(
-            obj.recipes.all()[:limit],
-            many=True,
-            context=self.context
+            recipes, many=True, context=self.context
         ).data
@@ -0,0 +1,102 @@
+import csv
+from functools import cache
+from io import BytesIO
+from pathlib import Path
+
+from django.db.models import Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+from recipes.models import RecipeIngredient
+
+# Встроенные шрифты PDF не содержат кириллицы.
+PDF_FONT = 'DejaVuSans'
+PDF_FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'DejaVuSans.ttf'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 20 * mm
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    return RecipeIngredient.objects.filter(
+        recipe__shoppingcarts__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name').iterator()
+
+
+def format_item(item):
+    return (
+        f'- {item["ingredient__name"]} '
+        f'({item["ingredient__measurement_unit"]}) — '
+        f'{item["total_amount"]}'
+    )
+
+
+def render_txt(items):
+    yield 'Список покупок:\n\n'
+    for item in items:
+        yield format_item(item) + '\n'
+
+
+def render_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Продукт', 'Единица измерения', 'Количество'])
+    for item in items:
+        yield writer.writerow([
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount'],
+        ])
+
+
+@cache
+def register_pdf_font():
+    pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
+
+
+def build_pdf(lines):
+    # PDF собирается целиком: ссылки на страницы и таблица смещений
+    # пишутся в конец файла.
+    register_pdf_font()
+    content = BytesIO()
+    pdf = Canvas(content, pagesize=A4)
+    width, height = A4
+    leading = PDF_FONT_SIZE * 1.4
+    top = height - PDF_MARGIN
+    y = top
+    for line in lines:
+        for part in simpleSplit(
+            line, PDF_FONT, PDF_FONT_SIZE, width - 2 * PDF_MARGIN
+        ) or ['']:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                y = top
+            pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+            pdf.drawString(PDF_MARGIN, y, part)
+            y -= leading
+    pdf.save()
+    return content.getvalue()
+
+
+def render_pdf(items):
+    yield build_pdf(
+        ['Список покупок:', '', *(format_item(item) for item in items)]
+    )
+
+
+SHOPPING_LIST_RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, User
+from .cache import bump_versions
+from .images import delete_variants
+from .ingredient_index import ingredient_index
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    transaction.on_commit(lambda: bump_versions('ingredients'))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_responses(instance, **kwargs):
+    transaction.on_commit(lambda: bump_versions(
+        'recipes', f'recipe:{instance.pk}', f'author:{instance.author_id}'
+    ))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def delete_image_variants(sender, instance, **kwargs):
+    field_name = 'image' if sender is Recipe else 'avatar'
+    storage = sender._meta.get_field(field_name).storage
+    variants = getattr(instance, f'{field_name}_variants')
+    transaction.on_commit(lambda: delete_variants(storage, variants))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def invalidate_recipe_ingredient_responses(instance, **kwargs):
+    # post_delete не слушаем, чтобы Django удалял строки одним запросом:
+    # их удаляют вместе с сохранением или удалением рецепта либо
+    # продукта, а те меняют версии сами. Рецепт обычно уже присвоен
+    # строке, и автор известен без запроса.
+    author_id = instance.recipe.author_id
+    transaction.on_commit(lambda: bump_versions(
+        'recipes', f'recipe:{instance.recipe_id}', f'author:{author_id}'
+    ))
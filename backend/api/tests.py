@@ -0,0 +1,359 @@
+import base64
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from PIL import Image
+
+from recipes.models import (
+    FavoriteRecipe, Ingredient, Recipe, RecipeIngredient, ShoppingCart, User
+)
+
+from .json_backends import BACKENDS
+from .recipe_index import IndexSnapshot, search_database
+from .recipe_rows import recipe_rows, serialize_recipe_rows
+from .renderers import FastJSONRenderer
+from .serializers import RecipeSerializer
+
+
+class RecipeRowsTest(TestCase):
+    # serialize_recipe_rows обязана выдавать тот же JSON, что
+    # RecipeSerializer(many=True), байт в байт.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        salt, milk = Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='Молоко "3,2%"', measurement_unit='мл'),
+        ])
+        with_ingredients, without_image, with_variants, plain = (
+            Recipe.objects.bulk_create([
+                Recipe(
+                    author=cls.user, name='С продуктами',
+                    text='Строка\nс переводом', image='recipes/images/a.png',
+                    cooking_time=10,
+                ),
+                Recipe(
+                    author=cls.user, name='Без картинки', text='Текст',
+                    image='', cooking_time=1,
+                ),
+                Recipe(
+                    author=cls.user, name='С вариантами', text='Текст',
+                    image='recipes/images/b.png', cooking_time=30,
+                    image_variants={
+                        'small': 'recipes/images/variants/b_small.webp',
+                        'medium': 'recipes/images/variants/b_medium.webp',
+                    },
+                ),
+                Recipe(
+                    author=cls.user, name='Без продуктов', text='Текст',
+                    image='recipes/images/c.png', cooking_time=5,
+                ),
+            ])
+        )
+        Recipe.objects.filter(pk=plain.pk).update(
+            created_at=datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=with_ingredients, ingredient=milk,
+                             amount=200),
+            RecipeIngredient(recipe=with_ingredients, ingredient=salt,
+                             amount=5),
+            RecipeIngredient(recipe=without_image, ingredient=salt,
+                             amount=1),
+            RecipeIngredient(recipe=with_variants, ingredient=milk,
+                             amount=3),
+        ])
+        FavoriteRecipe.objects.create(user=cls.user, recipe=with_ingredients)
+        ShoppingCart.objects.create(user=cls.user, recipe=with_variants)
+
+    def assert_same_json(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        queryset = Recipe.objects.for_response(user).order_by(
+            '-created_at', '-id'
+        )
+        renderer = JSONRenderer()
+        expected = renderer.render(RecipeSerializer(
+            queryset, many=True, context={'request': request}
+        ).data)
+        actual = renderer.render(
+            serialize_recipe_rows(list(recipe_rows(queryset)), request)
+        )
+        self.assertEqual(actual, expected)
+
+    def test_same_json_for_anonymous_user(self):
+        self.assert_same_json(AnonymousUser())
+
+    def test_same_json_for_authenticated_user(self):
+        self.assert_same_json(self.user)
+
+
+class RecipeIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.salt, cls.milk, cls.flour = Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Соль', 'Молоко', 'Мука')
+        ])
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=user, name=f'Рецепт {index}', text='Текст',
+                image='recipes/images/a.png', cooking_time=10,
+            )
+            for index in range(3)
+        ])
+        first, second, third = cls.recipes
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=first, ingredient=cls.salt, amount=1),
+            RecipeIngredient(recipe=first, ingredient=cls.milk, amount=1),
+            RecipeIngredient(recipe=second, ingredient=cls.salt, amount=1),
+            RecipeIngredient(recipe=second, ingredient=cls.flour, amount=1),
+            RecipeIngredient(recipe=third, ingredient=cls.milk, amount=1),
+        ])
+
+    def assert_same_results(self, snapshot):
+        snapshot = snapshot.catch_up()
+        ingredient_ids = [self.salt.id, self.milk.id]
+        for covered in (False, True):
+            with self.subTest(covered=covered):
+                self.assertEqual(
+                    snapshot.search(ingredient_ids, covered)[:10],
+                    list(search_database(ingredient_ids, covered)),
+                )
+        return snapshot
+
+    def test_snapshot_matches_database(self):
+        self.assert_same_results(IndexSnapshot.build())
+
+    def test_snapshot_catches_up_with_other_processes(self):
+        # Удаления приходят через журнал, который пишет триггер базы,
+        # а не через сигналы этого процесса.
+        snapshot = IndexSnapshot.build()
+        first, second, third = self.recipes
+        second_id = second.id
+        RecipeIngredient.objects.filter(recipe=first).delete()
+        RecipeIngredient.objects.create(
+            recipe=first, ingredient=self.milk, amount=2
+        )
+        RecipeIngredient.objects.create(
+            recipe=third, ingredient=self.salt, amount=2
+        )
+        second.delete()
+        synced = self.assert_same_results(snapshot)
+        self.assertEqual(
+            synced.search([self.salt.id, self.milk.id], False)[:10],
+            [third.id, first.id],
+        )
+        # Опубликованный снимок читают без блокировки, догон его не меняет.
+        self.assertEqual(
+            snapshot.search([self.salt.id, self.milk.id], False)[:10],
+            [first.id, third.id, second_id],
+        )
+
+
+class RecipeIndexCommitOrderTest(TransactionTestCase):
+    # id строк выдаются при вставке, а видны строки после коммита.
+    def test_rows_committed_out_of_order(self):
+        user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        salt, milk = Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='Молоко', measurement_unit='мл'),
+        ])
+        first, second = Recipe.objects.bulk_create([
+            Recipe(
+                author=user, name=f'Рецепт {index}', text='Текст',
+                image='recipes/images/a.png', cooking_time=10,
+            )
+            for index in range(2)
+        ])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=first, ingredient=salt, amount=1),
+            RecipeIngredient(recipe=second, ingredient=salt, amount=1),
+        ])
+        snapshot = IndexSnapshot.build()
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            other.set_autocommit(False)
+            with other.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO recipes_recipeingredient '
+                    '(recipe_id, ingredient_id, amount) '
+                    'VALUES (%s, %s, 1) RETURNING id',
+                    [first.id, milk.id]
+                )
+                early_id = cursor.fetchone()[0]
+                cursor.execute(
+                    'DELETE FROM recipes_recipeingredient '
+                    'WHERE recipe_id = %s AND ingredient_id = %s',
+                    [first.id, salt.id]
+                )
+            late = RecipeIngredient.objects.create(
+                recipe=second, ingredient=milk, amount=1
+            )
+            self.assertGreater(late.id, early_id)
+            RecipeIngredient.objects.filter(
+                recipe=second, ingredient=salt
+            ).delete()
+            snapshot = snapshot.catch_up()
+            self.assertEqual(snapshot.search([milk.id], False)[:10],
+                             [second.id])
+            other.commit()
+        finally:
+            other.close()
+        snapshot = snapshot.catch_up()
+        self.assertEqual(
+            snapshot.search([milk.id], False)[:10], [second.id, first.id]
+        )
+        self.assertEqual(snapshot.search([salt.id], False)[:10], [])
+
+
+class ShoppingListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст',
+            image='recipes/images/a.png', cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name='Соль', measurement_unit='г'
+            ),
+            amount=5,
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_formats(self):
+        for file_format, content_type, start in (
+            ('txt', 'text/plain; charset=utf-8', 'Список покупок'.encode()),
+            ('csv', 'text/csv; charset=utf-8', 'Продукт'.encode()),
+            ('pdf', 'application/pdf', b'%PDF-'),
+        ):
+            with self.subTest(file_format):
+                response = self.client.get(
+                    '/api/recipes/download_shopping_list/',
+                    {'format': file_format}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertTrue(
+                    b''.join(response.streaming_content).startswith(start)
+                )
+
+
+class UserAvatarTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            avatar='users/old.png',
+            avatar_variants={'small': 'users/variants/old_small.webp'},
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_avatar_changed_through_me(self):
+        content = BytesIO()
+        Image.new('RGB', (2, 2)).save(content, 'PNG')
+        avatar = 'data:image/png;base64,' + base64.b64encode(
+            content.getvalue()
+        ).decode()
+        with (
+            tempfile.TemporaryDirectory() as media_root,
+            override_settings(MEDIA_ROOT=media_root),
+            mock.patch('api.serializers.schedule_variants') as schedule,
+            mock.patch('api.serializers.delete_variants') as delete,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.patch(
+                '/api/users/me/', {'avatar': avatar}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['avatar_variants'], {})
+        schedule.assert_called_once_with(self.user, 'avatar')
+        delete.assert_called_once_with(
+            mock.ANY, {'small': 'users/variants/old_small.webp'}
+        )
+
+
+class RecipeCursorTest(TestCase):
+    def test_cursor_with_search_is_rejected(self):
+        client = APIClient()
+        self.assertEqual(
+            client.get('/api/recipes/', {'cursor': ''}).status_code, 200
+        )
+        response = client.get(
+            '/api/recipes/', {'cursor': '', 'search': 'суп'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+
+class ResponseCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Recipe.objects.create(
+            author=User.objects.create_user(
+                email='user@example.com', username='user',
+                password='password',
+            ),
+            name='Рецепт', text='Текст', image='recipes/images/a.png',
+            cooking_time=10,
+        )
+
+    @override_settings(
+        RESPONSE_CACHE_TIMEOUT=60, ALLOWED_HOSTS=['a.example', 'b.example']
+    )
+    def test_links_match_request_host(self):
+        client = APIClient()
+        for scheme, host in (
+            ('http', 'a.example'), ('https', 'a.example'),
+            ('http', 'b.example'),
+        ):
+            with self.subTest(scheme=scheme, host=host):
+                response = client.get(
+                    '/api/recipes/', HTTP_HOST=host, secure=scheme == 'https'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data['results'][0]['image']
+                                .startswith(f'{scheme}://{host}/'))
+
+
+class FastJSONRendererTest(TestCase):
+    def test_same_json_as_drf(self):
+        data = {
+            'id': 2 ** 64, 'small': -2 ** 63, 'name': 'Рецепт "1"',
+            'text': 'Строка\u2028строка', 'items': [1, None, True],
+            3: 'ключ-число',
+        }
+        expected = JSONRenderer().render(data)
+        for name, (*_, module) in BACKENDS.items():
+            if module is None:
+                continue
+            with self.subTest(name), override_settings(JSON_BACKEND=name):
+                self.assertEqual(FastJSONRenderer().render(data), expected)
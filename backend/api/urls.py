@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import favorite, shopping_cart, short_link
 from .views import IngredientViewSet, RecipeViewSet, UserViewSet
 from recipes.views import recipe_redirect_view
 
@@ -9,6 +10,12 @@ router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'users', UserViewSet, basename='users')
 
 urlpatterns = [
+    path('recipes/<int:recipe_id>/add_to_favorites/', favorite,
+         name='recipe-favorite'),
+    path('recipes/<int:recipe_id>/add_to_shopping_cart/', shopping_cart,
+         name='recipe-shopping-cart'),
+    path('recipes/<int:recipe_id>/get_short_link/', short_link,
+         name='recipe-short-link'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('s/<int:recipe_id>/', recipe_redirect_view, name='recipe_redirect')
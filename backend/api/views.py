@@ -1,3 +1,7 @@
+from collections import defaultdict
+from functools import partial
+from itertools import chain
+
 from rest_framework import viewsets, status
 from rest_framework.permissions import (
     IsAuthenticated, IsAuthenticatedOrReadOnly
@@ -6,126 +10,218 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework.filters import SearchFilter
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.urls import reverse
+from recipes.feed import get_feed
+from recipes.popular import get_popular
 from recipes.models import (
-    Ingredient, Recipe, FavoriteRecipe, ShoppingCart, User, Subscription
+    FavoriteRecipe, Ingredient, Recipe, ShoppingCart, User, Subscription
 )
 from .serializers import (
     IngredientSerializer, RecipeSerializer, AuthorSubscriptionSerializer,
-    RecipeCreateUpdateSerializer, AvatarSerializer, UserSerializer
+    RecipeCreateUpdateSerializer, AvatarSerializer, UserSerializer,
+    RecipeIdsSerializer, get_recipes_limit
+)
+from .cache import ResponseCacheMixin
+from .filters import IngredientFilter, RecipeFilter
+from .images import delete_variants
+from .ingredient_index import ingredient_index
+from .recipe_collections import change_collection
+from .recipe_index import recipe_index
+from .recipe_rows import recipe_rows, serialize_recipe_rows
+from .pagination import (
+    LimitPagination, RecipeFeedPagination, SubscriptionFeedPagination
+)
+from .renderers import (
+    ShoppingListTextRenderer, ShoppingListCSVRenderer, ShoppingListPDFRenderer
 )
-from .filters import RecipeFilter
-from .pagination import LimitPagination
+from .shopping_list import SHOPPING_LIST_RENDERERS, get_shopping_list
 
+# Результат для каждого id в пакетных запросах к избранному и списку
+# покупок: изменена ли связь, None — рецепта нет.
+BULK_STATUSES = {
+    'POST': {True: 'added', False: 'already_added', None: 'not_found'},
+    'DELETE': {True: 'removed', False: 'not_added', None: 'not_found'},
+}
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [SearchFilter]
-    search_fields = ['^name']
+    pagination_class = None
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_INDEX_TIMEOUT:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
+    def get_cache_scopes(self):
+        return ['ingredients']
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(ResponseCacheMixin, ModelViewSet):
+    cached_actions = ('list', 'retrieve', 'popular')
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = LimitPagination
+    pagination_class = RecipeFeedPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
     def get_serializer_class(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in [
+            'create', 'update', 'partial_update', 'import_recipes'
+        ]:
             return RecipeCreateUpdateSerializer
         return RecipeSerializer
 
-    def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+    def get_queryset(self):
+        return self.queryset.for_response(self.request.user)
 
-    @action(detail=True, methods=['post'],
-            permission_classes=[IsAuthenticated])
-    def add_to_favorites(self, request, id):
-        return self.add_recipe_to_collection(
-            request, id, FavoriteRecipe, 'избранное'
-        )
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return ['ingredients', f'recipe:{self.kwargs["pk"]}']
+        if self.action == 'popular':
+            # Счётчики обновляет отдельный процесс rollup_popular, поэтому
+            # ответ устаревает не дольше чем на RESPONSE_CACHE_TIMEOUT.
+            return ['ingredients', 'recipes']
+        authors = self.request.query_params.getlist('author')
+        if len(authors) == 1:
+            return ['ingredients', f'author:{authors[0]}']
+        return ['ingredients', 'recipes']
 
-    @add_to_favorites.mapping.delete
-    def remove_from_favorites(self, request, id):
-        get_object_or_404(
-            FavoriteRecipe, user=request.user, recipe_id=id
-        ).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_FAST_SERIALIZER:
+            return super().list(request, *args, **kwargs)
+        return self.dispatch_cached(request, self.list_rows)
 
-    @action(detail=True, methods=['post'],
-            permission_classes=[IsAuthenticated])
-    def add_to_shopping_cart(self, request, id):
-        return self.add_recipe_to_collection(
-            request, id, ShoppingCart, 'список покупок'
+    def list_rows(self, request):
+        rows = self.paginate_queryset(
+            recipe_rows(self.filter_queryset(self.get_queryset()))
+        )
+        return self.get_paginated_response(
+            serialize_recipe_rows(rows, request)
         )
 
-    @add_to_shopping_cart.mapping.delete
-    def remove_from_shopping_cart(self, request, id):
-        get_object_or_404(
-            ShoppingCart, user=request.user, recipe_id=id
-        ).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAuthenticated], url_path='import')
+    def import_recipes(self, request):
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False,
+            max_length=settings.RECIPE_IMPORT_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(author=request.user)
+        return Response(
+            {'ids': [recipe.id for recipe in recipes]},
+            status=status.HTTP_201_CREATED
+        )
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[
+                ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                ShoppingListPDFRenderer,
+            ])
     def download_shopping_list(self, request):
-        shopping_cart = request.user.shopping_cart.all()
-        if not shopping_cart.exists():
+        items = get_shopping_list(request.user)
+        first_item = next(items, None)
+        if first_item is None:
             return Response(
                 {'detail': 'Список покупок пуст.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        shopping_list = 'Список покупок:\n\n'
-        for item in shopping_cart:
-            recipe = item.recipe
-            shopping_list += (
-                f'- {recipe.name} (время приготовления: '
-                f'{recipe.cooking_time} мин.)\n'
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_RENDERERS[renderer.format](
+                chain([first_item], items)
+            ),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
             )
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
         return response
 
-    @action(detail=True, methods=['get'],
-            permission_classes=[IsAuthenticatedOrReadOnly])
-    def get_short_link(self, request, id):
-        get_object_or_404(Recipe, pk=id)
-        short_link = request.build_absolute_uri(reverse(
-            'recipe_redirect', kwargs={'recipe_id': id}
+    @action(detail=False, methods=['get'], pagination_class=LimitPagination)
+    def by_ingredients(self, request):
+        try:
+            ingredient_ids = [
+                int(ingredient_id)
+                for value in request.query_params.getlist('ingredients')
+                for ingredient_id in value.split(',')
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Укажите идентификаторы продуктов.'}
+            )
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один продукт.'}
+            )
+        page = self.paginate_queryset(recipe_index.search(
+            ingredient_ids,
+            covered=request.query_params.get('covered') in ('1', 'true')
         ))
-        return Response({"short_link": short_link}, status=status.HTTP_200_OK)
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated], url_path='favorites')
+    def bulk_favorites(self, request):
+        return self.bulk_change_collection(request, FavoriteRecipe)
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated], url_path='shopping_cart')
+    def bulk_shopping_cart(self, request):
+        return self.bulk_change_collection(request, ShoppingCart)
 
-    def add_recipe_to_collection(
-            self, request, recipe_id, model, collection_name
-        ):
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        _, created = model.objects.get_or_create(
-            user=request.user, recipe=recipe
+    def bulk_change_collection(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        changed = change_collection(
+            model, request.user.id, recipe_ids, request.method == 'POST'
         )
-        if not created:
-            return Response(
-                {'detail': f'Рецепт уже находится в {collection_name}.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return Response(
-            {'detail': f'Рецепт добавлен в {collection_name}.'},
-            status=status.HTTP_201_CREATED
+        statuses = BULK_STATUSES[request.method]
+        return Response({'results': [
+            {'id': recipe_id, 'status': statuses[changed.get(recipe_id)]}
+            for recipe_id in recipe_ids
+        ]})
+
+    @action(detail=False, methods=['get'], pagination_class=LimitPagination)
+    def popular(self, request):
+        return self.dispatch_cached(request, self.list_popular)
+
+    def list_popular(self, request):
+        page = self.paginate_queryset(get_popular(settings.POPULAR_SIZE))
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True
         )
+        return self.get_paginated_response(serializer.data)
 
 
 class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = LimitPagination
 
     @action(detail=False, methods=['put'],
             permission_classes=[IsAuthenticated], url_path='me/avatar')
@@ -140,21 +236,48 @@ class UserViewSet(DjoserUserViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['delete'],
-            permission_classes=[IsAuthenticated], url_path='me/avatar')
+    @update_avatar.mapping.delete
     def delete_avatar(self, request):
         user = request.user
+        storage, variants = user.avatar.storage, user.avatar_variants
+        user.avatar_variants = {}
         user.avatar.delete(save=True)
+        transaction.on_commit(lambda: delete_variants(storage, variants))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated], url_path='me/subscriptions')
     def list_subscriptions(self, request):
-        subscriptions = request.user.subscriptions.all()
+        authors = self.paginate_queryset(
+            User.objects.filter(authors__user=request.user)
+        )
+        recipes_by_author = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_author(
+            [author.id for author in authors], get_recipes_limit(request)
+        ).only('id', 'author_id', 'name', 'image', 'cooking_time'):
+            recipes_by_author[recipe.author_id].append(recipe)
         serializer = AuthorSubscriptionSerializer(
-            subscriptions, many=True, context={'request': request}
+            authors, many=True, context={
+                'request': request,
+                'recipes_by_author': recipes_by_author,
+            }
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated], url_path='me/feed',
+            pagination_class=SubscriptionFeedPagination)
+    def feed(self, request):
+        entries = self.paginate_queryset(partial(get_feed, request.user))
+        recipes = Recipe.objects.for_response(request.user).in_bulk(
+            [recipe_id for recipe_id, _ in entries]
+        )
+        serializer = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _ in entries
+             if recipe_id in recipes],
+            many=True, context=self.get_serializer_context()
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated], url_path='subscribe')
@@ -165,7 +288,7 @@ class UserViewSet(DjoserUserViewSet):
                 {'detail': 'Нельзя подписаться на самого себя.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        subscription, created = Subscription.objects.get_or_create(
+        _, created = Subscription.objects.get_or_create(
             user=request.user, author=author
         )
         if not created:
@@ -175,7 +298,7 @@ class UserViewSet(DjoserUserViewSet):
             )
         return Response(
             AuthorSubscriptionSerializer(
-                subscription, context={'request': request}
+                author, context={'request': request}
             ).data,
             status=status.HTTP_201_CREATED,
         )
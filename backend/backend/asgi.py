@@ -1,7 +1,25 @@
-import os
+from time import perf_counter
 
-from django.core.asgi import get_asgi_application
+started = perf_counter()
+
+import os  # noqa: E402
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Первое обращение к настройкам импортирует модуль settings.
+settings.INSTALLED_APPS
+imported = perf_counter()
+django.setup(set_prefix=False)
+apps_ready = perf_counter()
+
 application = get_asgi_application()
+
+startup_times = {
+    'import': imported - started,
+    'apps': apps_ready - imported,
+    'application': perf_counter() - apps_ready,
+}
@@ -0,0 +1,147 @@
+from collections import deque
+from functools import partial
+from threading import BoundedSemaphore, Lock
+from time import monotonic, perf_counter
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import Error, OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from api.metrics import (
+    DB_POOL_CONNECTIONS, DB_POOL_TIMEOUTS, DB_POOL_WAIT,
+)
+
+pools = {}
+pools_lock = Lock()
+
+
+class ConnectionPool:
+    # Соединения живут дольше запроса: Django «закрывает» соединение
+    # в конце запроса, а на деле возвращает его в пул.
+    def __init__(self, alias, min_size, max_size, timeout, max_idle,
+                 health_checks):
+        self.alias = alias
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_checks = health_checks
+        self._slots = BoundedSemaphore(max_size)
+        self._lock = Lock()
+        self._idle = deque()
+        self.size = 0
+
+    def _update_gauges(self):
+        DB_POOL_CONNECTIONS.labels(self.alias, 'idle').set(len(self._idle))
+        DB_POOL_CONNECTIONS.labels(self.alias, 'in_use').set(
+            self.size - len(self._idle)
+        )
+
+    def _discard(self, connection):
+        self.size -= 1
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def _is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Error:
+            return False
+        return True
+
+    def get(self, connect):
+        started = perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            DB_POOL_TIMEOUTS.labels(self.alias).inc()
+            raise OperationalError(
+                f'Пул соединений {self.alias} исчерпан: ожидание '
+                f'дольше {self.timeout} с.'
+            )
+        DB_POOL_WAIT.labels(self.alias).observe(perf_counter() - started)
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        self.size += 1
+                        break
+                    connection, _ = self._idle.pop()
+                    self._update_gauges()
+                if self._is_usable(connection):
+                    return connection
+                with self._lock:
+                    self._discard(connection)
+            connection = connect()
+        except BaseException:
+            with self._lock:
+                self.size -= 1
+            self._slots.release()
+            raise
+        with self._lock:
+            self._update_gauges()
+        return connection
+
+    def put(self, connection):
+        try:
+            if (
+                not connection.closed
+                and connection.info.transaction_status
+                != TRANSACTION_STATUS_IDLE
+            ):
+                connection.rollback()
+        except Error:
+            pass
+        now = monotonic()
+        with self._lock:
+            if connection.closed:
+                self.size -= 1
+            else:
+                self._idle.append((connection, now))
+            # Простаивающие дольше max_idle соединения закрываются,
+            # пока в пуле остаётся больше min_size соединений.
+            while (
+                self.size > self.min_size
+                and self._idle
+                and now - self._idle[0][1] > self.max_idle
+            ):
+                self._discard(self._idle.popleft()[0])
+            self._update_gauges()
+        self._slots.release()
+
+
+def get_pool(alias, settings_dict):
+    with pools_lock:
+        if alias not in pools:
+            options = settings_dict['POOL_OPTIONS']
+            pools[alias] = ConnectionPool(
+                alias,
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                health_checks=settings_dict['CONN_HEALTH_CHECKS'],
+            )
+        return pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get(
+                'isolation_level', IsolationLevel.READ_COMMITTED
+            )
+        )
+        return get_pool(self.alias, self.settings_dict).get(
+            partial(super().get_new_connection, conn_params)
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                get_pool(self.alias, self.settings_dict).put(self.connection)
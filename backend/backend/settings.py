@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -37,6 +38,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.RequestProfilingMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,10 +101,52 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Под ASGI у каждого запроса свой контекст и своё соединение,
+        # поэтому постоянные соединения там не переиспользуются, а копятся.
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE', 0 if os.getenv('SERVER_MODE') == 'asgi' else 60
+        )),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
     }
 }
 
+if os.getenv('DB_POOL', 'False') == 'True':
+    # Соединение возвращается в пул в конце каждого запроса.
+    DATABASES['default'].update({
+        'ENGINE': 'backend.pool',
+        'CONN_MAX_AGE': 0,
+        'POOL_OPTIONS': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+        },
+    })
+
+# Реплики для чтения: DB_REPLICAS=host[:port][/name],...
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter'] if DATABASE_REPLICAS else []
+
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+
 #Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -143,6 +189,24 @@ STATIC_ROOT = '/app/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+
+IMAGE_MAX_UPLOAD_SIZE = int(
+    os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'feed': (640, 640),
+}
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 80))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+RECIPE_IMPORT_MAX_SIZE = int(os.getenv('RECIPE_IMPORT_MAX_SIZE', 1000))
+
+RECIPE_FAST_SERIALIZER = os.getenv('RECIPE_FAST_SERIALIZER', 'False') == 'True'
+
+RECIPE_COLLECTION_BULK_MAX_SIZE = int(
+    os.getenv('RECIPE_COLLECTION_BULK_MAX_SIZE', 100)
+)
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -160,6 +224,98 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# orjson, ujson, json или auto — первая установленная из них.
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+if os.getenv('RESPONSE_CACHE_BACKEND') == 'file':
+    CACHES['responses'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_LOCATION', '/tmp/foodgram_response_cache'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 1000)),
+        },
+    }
+    RESPONSE_CACHE_ALIAS = 'responses'
+else:
+    RESPONSE_CACHE_ALIAS = 'default'
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+INGREDIENT_INDEX_TIMEOUT = int(os.getenv('INGREDIENT_INDEX_TIMEOUT', 300))
+
+RECIPE_INDEX_TIMEOUT = int(os.getenv('RECIPE_INDEX_TIMEOUT', 3600))
+
+# Как часто индекс рецептов по продуктам догоняет базу, секунды, и сколько
+# последних id строк он при этом перечитывает, чтобы не пропустить
+# транзакции, закоммиченные не в порядке выдачи id.
+RECIPE_INDEX_SYNC_INTERVAL = float(
+    os.getenv('RECIPE_INDEX_SYNC_INTERVAL', 1)
+)
+RECIPE_INDEX_RESCAN_ROWS = int(os.getenv('RECIPE_INDEX_RESCAN_ROWS', 1000))
+
+# Сколько хранится журнал удалённых продуктов рецептов. Индекс, который
+# не догонялся дольше, уступает поиск базе до следующей пересборки.
+RECIPE_INDEX_LOG_RETENTION = int(
+    os.getenv('RECIPE_INDEX_LOG_RETENTION', 86400)
+)
+
+FEED_CELEBRITY_THRESHOLD = int(os.getenv('FEED_CELEBRITY_THRESHOLD', 1000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+
+POPULAR_WINDOW_DAYS = int(os.getenv('POPULAR_WINDOW_DAYS', 7))
+
+POPULAR_HALF_LIFE_HOURS = float(os.getenv('POPULAR_HALF_LIFE_HOURS', 24))
+
+POPULAR_SIZE = int(os.getenv('POPULAR_SIZE', 60))
+
+POPULAR_ROLLUP_INTERVAL = int(os.getenv('POPULAR_ROLLUP_INTERVAL', 60))
+
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False') == 'True'
+
+REQUEST_PROFILING_BUFFER_SIZE = int(
+    os.getenv('REQUEST_PROFILING_BUFFER_SIZE', 50)
+)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 DJOSER = {
@@ -3,11 +3,22 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.admin import slow_requests_view
+from api.metrics import metrics_view
+
 urlpatterns = [
+    path(
+        'admin/slow-requests/',
+        admin.site.admin_view(slow_requests_view),
+        name='admin-slow-requests',
+    ),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
 
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,
                           document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,92 @@
+import os
+import shutil
+from importlib import import_module
+
+# gunicorn читает этот файл из рабочего каталога автоматически, поэтому
+# для запуска достаточно команды `gunicorn`. Режим выбирается SERVER_MODE:
+# wsgi — потоковые воркеры gthread, asgi — воркеры uvicorn.
+
+if hasattr(os, 'sched_getaffinity'):
+    cores = len(os.sched_getaffinity(0))
+else:
+    cores = os.cpu_count() or 1
+
+mode = os.getenv('SERVER_MODE', 'wsgi')
+bind = os.getenv('SERVER_BIND', '0.0.0.0:8000')
+reload = os.getenv('SERVER_RELOAD', 'False') == 'True'
+# При общей загрузке приложения мастер импортирует Django до fork,
+# и воркеры делят эту память copy-on-write. С автоперезагрузкой несовместимо.
+preload_app = not reload and os.getenv('SERVER_PRELOAD', 'True') == 'True'
+
+if mode == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = int(os.getenv('SERVER_WORKERS', cores))
+    threads = 1
+else:
+    wsgi_app = 'backend.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.getenv('SERVER_WORKERS', cores + 1))
+    threads = int(os.getenv('SERVER_THREADS', 4))
+
+timeout = int(os.getenv('SERVER_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('SERVER_KEEPALIVE', 5))
+# Воркеры плавно перезапускаются, чтобы утечки памяти не копились.
+max_requests = int(os.getenv('SERVER_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+# Метрики воркеров суммируются через общий каталог. Переменная задаётся
+# только процессам gunicorn: команды manage.py пишут метрики в память
+# своего процесса и не попадают в /metrics сервера.
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus'
+)
+
+
+def on_starting(server):
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir)
+
+
+def when_ready(server):
+    if preload_app:
+        times = import_module(wsgi_app.split(':')[0]).startup_times
+        server.log.info(
+            'Время старта: импорт Django и настроек %.0f мс, '
+            'инициализация приложений %.0f мс, сборка %s %.0f мс',
+            times['import'] * 1000,
+            times['apps'] * 1000,
+            wsgi_app,
+            times['application'] * 1000,
+        )
+        # Воркеры наследуют индекс рецептов по продуктам от мастера,
+        # поэтому новым воркерам не нужна полная выборка из базы.
+        from django.db import connections
+
+        from api.recipe_index import recipe_index
+
+        try:
+            recipe_index.rebuild()
+        except Exception:
+            server.log.exception('Не удалось собрать индекс рецептов')
+        finally:
+            connections.close_all()
+    server.log.info(
+        'Режим %s: %d воркеров %s × %d потоков на %d ядрах',
+        mode, workers, worker_class, threads, cores,
+    )
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером до fork, воркерам использовать нельзя.
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -52,18 +52,6 @@ class UserAdmin(BaseUserAdmin):
                 'style="width: 50px; height: 50px; border-radius: 50%;">'
                 if user.avatar else '')
 
-    @admin.display(description='Рецепты')
-    def recipes_count(self, user):
-        return user.recipes.count()
-
-    @admin.display(description='Подписки')
-    def subscriptions_count(self, user):
-        return user.subscriptions.count()
-
-    @admin.display(description='Подписчики')
-    def subscribers_count(self, user):
-        return user.followers.count()
-
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -140,12 +128,12 @@ class CookingTimeFilter(admin.SimpleListFilter):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'name', 'cooking_time', 'author', 
-        'favorite_count', 'display_ingredients', 'display_image'
+        'favorites_count', 'display_ingredients', 'display_image'
     )
     search_fields = ('name', 'author__username', 'author__email')
     list_filter = (CookingTimeFilter, 'author')
     inlines = (RecipeIngredientInline,)
-    readonly_fields = ('favorite_count',)
+    readonly_fields = ('favorites_count',)
 
     @admin.display(description='Ингредиенты')
     @mark_safe
@@ -166,12 +154,6 @@ class RecipeAdmin(admin.ModelAdmin):
             if recipe.image else ''
         )
 
-    @admin.display(description='В избранном')
-    def favorite_count(self, recipe):
-        return recipe.user_recipe_relations.filter(
-            favoriterecipe__isnull=False
-        ).count()
-
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
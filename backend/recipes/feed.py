@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Recipe, Subscription, User
+from .sql import quote
+
+# Лента подписок: рецепты обычных авторов раскладываются по лентам
+# подписчиков при публикации, рецепты авторов, у которых подписчиков не
+# меньше FEED_CELEBRITY_THRESHOLD, подмешиваются при чтении.
+
+
+def fan_out_recipes(recipe_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry)} (user_id, recipe_id, created_at) '
+            f'SELECT s.user_id, r.id, r.created_at FROM {quote(Recipe)} r '
+            f'JOIN {quote(Subscription)} s ON s.author_id = r.author_id '
+            f'JOIN {quote(User)} a ON a.id = r.author_id '
+            f'WHERE r.id = ANY(%s) AND a.subscribers_count < %s '
+            f'ON CONFLICT DO NOTHING',
+            [list(recipe_ids), settings.FEED_CELEBRITY_THRESHOLD]
+        )
+        return cursor.rowcount
+
+
+def add_author_to_feed(user_id, author_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry)} (user_id, recipe_id, created_at) '
+            f'SELECT %s, r.id, r.created_at FROM {quote(Recipe)} r '
+            f'JOIN {quote(User)} a ON a.id = r.author_id '
+            f'WHERE r.author_id = %s AND a.subscribers_count < %s '
+            f'ORDER BY r.created_at DESC, r.id DESC LIMIT %s '
+            f'ON CONFLICT DO NOTHING',
+            [user_id, author_id, settings.FEED_CELEBRITY_THRESHOLD,
+             settings.FEED_BACKFILL_SIZE]
+        )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def rebuild_feeds():
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {quote(FeedEntry)}')
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry)} (user_id, recipe_id, created_at) '
+            f'SELECT s.user_id, r.id, r.created_at '
+            f'FROM {quote(Subscription)} s '
+            f'JOIN {quote(User)} a ON a.id = s.author_id '
+            f'CROSS JOIN LATERAL (SELECT id, created_at FROM {quote(Recipe)} '
+            f'WHERE author_id = s.author_id '
+            f'ORDER BY created_at DESC, id DESC LIMIT %s) r '
+            f'WHERE a.subscribers_count < %s',
+            [settings.FEED_BACKFILL_SIZE, settings.FEED_CELEBRITY_THRESHOLD]
+        )
+        return cursor.rowcount
+
+
+def get_feed(user, after, limit):
+    # Пары (id рецепта, created_at), идущие после курсора after.
+    entries = FeedEntry.objects.filter(user=user)
+    recipes = Recipe.objects.filter(author__in=Subscription.objects.filter(
+        user=user,
+        author__subscribers_count__gte=settings.FEED_CELEBRITY_THRESHOLD
+    ).values('author_id'))
+    if after is not None:
+        created_at, pk = after
+        entries = entries.filter(
+            Q(created_at__lte=created_at)
+            & (Q(created_at__lt=created_at) | Q(recipe_id__lt=pk))
+        )
+        recipes = recipes.filter(
+            Q(created_at__lte=created_at)
+            & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+        )
+    # UNION без ALL убирает рецепты знаменитостей, разложенные в ленту
+    # до того, как автор перешёл порог.
+    return list(
+        entries.order_by('-created_at', '-recipe_id').values_list(
+            'recipe_id', 'created_at'
+        )[:limit].union(
+            recipes.order_by('-created_at', '-pk').values_list(
+                'pk', 'created_at'
+            )[:limit]
+        ).order_by('-created_at', '-recipe_id')[:limit]
+    )
@@ -0,0 +1,150 @@
+import json
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from api.metrics import QueryCounter
+from recipes.models import Ingredient, User
+
+
+def get_scenarios(user):
+    author_id = user.followers.values_list('author_id', flat=True).first()
+    prefix = Ingredient.objects.values_list('name', flat=True).first()[:3]
+    return {
+        'recipes_list': '/api/recipes/?limit=6',
+        'recipes_filtered': (
+            f'/api/recipes/?limit=6&is_favorited=1&author={author_id}'
+        ),
+        'recipes_deep_page': '/api/recipes/?limit=6&page=50',
+        'ingredients_search': f'/api/ingredients/?name={prefix}',
+        'download_shopping_list': '/api/recipes/download_shopping_list/',
+        'subscriptions': '/api/users/me/subscriptions/?recipes_limit=3',
+    }
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def request(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+class Command(BaseCommand):
+    help = 'Измеряет задержку, число запросов и память горячих эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--scenario', action='append', dest='scenarios')
+        parser.add_argument('--output', help='Путь к JSON-отчёту')
+        parser.add_argument('--compare', help='Путь к отчёту для сравнения')
+
+    def handle(self, *args, iterations, warmup, scenarios, output, compare,
+               **kwargs):
+        user = User.objects.order_by(
+            '-subscriptions_count', '-recipes_count'
+        ).first()
+        if iterations < 1:
+            raise CommandError('Нужна хотя бы одна итерация.')
+        if user is None or not Ingredient.objects.exists():
+            raise CommandError('Сначала заполните базу командой seed_data.')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        available = get_scenarios(user)
+        unknown = set(scenarios or ()) - available.keys()
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}.'
+            )
+        results = {}
+        for name, url in available.items():
+            if scenarios and name not in scenarios:
+                continue
+            results[name] = self.run_scenario(client, url, iterations, warmup)
+            self.stdout.write(
+                f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                f'p95 {results[name]["p95_ms"]} мс, '
+                f'{results[name]["queries"]} запросов к БД, '
+                f'пик памяти {results[name]["peak_memory_kb"]} КБ'
+            )
+        report = {
+            'revision': get_revision(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'scenarios': results,
+        }
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if compare:
+            self.compare(compare, results)
+
+    def run_scenario(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            request(client, url)
+        timings = []
+        for _ in range(iterations):
+            started = perf_counter()
+            response = request(client, url)
+            timings.append((perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise CommandError(f'{url} вернул {response.status_code}.')
+        counter = QueryCounter(connection.alias)
+        with connection.execute_wrapper(counter):
+            request(client, url)
+        tracemalloc.start()
+        request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # quantiles() требует хотя бы двух измерений.
+        percentiles = (
+            quantiles(timings, n=100, method='inclusive')
+            if len(timings) > 1 else timings * 99
+        )
+        return {
+            'url': url,
+            'status': response.status_code,
+            'mean_ms': round(mean(timings), 2),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+            'queries': counter.count,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        self.stdout.write(f'Сравнение с {baseline.get("revision") or path}:')
+        for name, result in results.items():
+            previous = baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            change = (
+                (result['p50_ms'] - previous['p50_ms'])
+                / previous['p50_ms'] * 100
+            ) if previous['p50_ms'] else 0
+            self.stdout.write(
+                f'{name}: p50 {previous["p50_ms"]} → {result["p50_ms"]} мс '
+                f'({change:+.1f}%), запросы {previous["queries"]} → '
+                f'{result["queries"]}'
+            )
@@ -0,0 +1,94 @@
+import json
+from base64 import b64encode
+from datetime import datetime, timezone
+from decimal import Decimal
+from os import urandom
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.json_backends import BACKENDS, loads
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe, User
+
+
+def measure(function, argument, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = perf_counter()
+        function(argument)
+        timings.append(perf_counter() - started)
+    return median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет рендеринг страницы рецептов и разбор тела с картинкой '
+        'в base64 для каждой установленной библиотеки JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--image-size', type=int, default=1024 * 1024,
+            help='Размер картинки в теле запроса, байты'
+        )
+
+    def handle(self, *args, recipes, iterations, image_size, **kwargs):
+        user = User.objects.order_by('-subscriptions_count').first()
+        if Recipe.objects.count() < recipes:
+            raise CommandError(
+                f'В базе меньше {recipes} рецептов: запустите seed_data.'
+            )
+        request = Request(
+            APIRequestFactory(SERVER_NAME='localhost').get('/api/recipes/')
+        )
+        request.user = user
+        page = {
+            'count': recipes,
+            'generated_at': datetime.now(timezone.utc),
+            'rating': Decimal('4.50'),
+            'results': RecipeSerializer(
+                Recipe.objects.for_response(user)[:recipes], many=True,
+                context={'request': request}
+            ).data,
+        }
+        upload = JSONRenderer().render({
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'ingredients': [{'id': 1, 'amount': 10}],
+            'image': 'data:image/png;base64,'
+                     + b64encode(urandom(image_size)).decode(),
+        })
+        expected = JSONRenderer().render(page)
+        self.stdout.write(
+            f'Страница из {recipes} рецептов: {len(expected)} байт, '
+            f'тело с картинкой: {len(upload)} байт.'
+        )
+        self.stdout.write(
+            f'JSONRenderer из DRF: рендеринг '
+            f'{measure(JSONRenderer().render, page, iterations):.2f} мс'
+        )
+        for name, (*_, module) in BACKENDS.items():
+            if module is None:
+                self.stdout.write(f'{name}: не установлена')
+                continue
+            with override_settings(JSON_BACKEND=name):
+                rendered = FastJSONRenderer().render(page)
+                if rendered != expected:
+                    raise CommandError(
+                        f'{name}: JSON отличается от JSONRenderer из DRF.'
+                    )
+                if loads(upload) != json.loads(upload):
+                    raise CommandError(f'{name}: тело разобрано неверно.')
+                render = measure(FastJSONRenderer().render, page, iterations)
+                parse = measure(loads, upload, iterations)
+                self.stdout.write(
+                    f'{name}: рендеринг {render:.2f} мс, разбор {parse:.2f} мс'
+                )
@@ -0,0 +1,67 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.recipe_rows import recipe_rows, serialize_recipe_rows
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    # Совпадение JSON байт в байт проверяет api.tests.RecipeRowsTest.
+    help = (
+        'Измеряет время RecipeSerializer и быстрой сериализации списка '
+        'рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, recipes, iterations, **kwargs):
+        user = User.objects.order_by('-subscriptions_count').first()
+        if Recipe.objects.count() < recipes:
+            raise CommandError(
+                f'В базе меньше {recipes} рецептов: запустите seed_data.'
+            )
+        request = Request(
+            APIRequestFactory(SERVER_NAME='localhost').get('/api/recipes/')
+        )
+        request.user = user
+        queryset = Recipe.objects.for_response(user).order_by(
+            '-created_at', '-id'
+        )
+        renderer = JSONRenderer()
+
+        def serialize():
+            return renderer.render(RecipeSerializer(
+                queryset[:recipes], many=True, context={'request': request}
+            ).data)
+
+        def serialize_rows():
+            return renderer.render(serialize_recipe_rows(
+                list(recipe_rows(queryset)[:recipes]), request
+            ))
+
+        results = {}
+        for name, function in (
+            ('RecipeSerializer', serialize), ('values()', serialize_rows)
+        ):
+            timings = []
+            for _ in range(iterations):
+                started = perf_counter()
+                function()
+                timings.append(perf_counter() - started)
+            results[name] = median(timings) * 1000 / recipes * 1000
+            self.stdout.write(
+                f'{name}: {results[name]:.1f} мс на 1000 рецептов '
+                '(запросы к базе, сериализация и рендеринг JSON)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Ускорение: '
+            f'{results["RecipeSerializer"] / results["values()"]:.1f}×'
+        ))
@@ -1,22 +1,113 @@
+import csv
 import json
-from django.core.management.base import BaseCommand
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
 from recipes.models import Ingredient
 
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    # Что ожидается дальше: начало массива, первый элемент или конец,
+    # элемент после запятой, запятая или конец.
+    expected = 'array'
+    for chunk in iter(lambda: file.read(chunk_size), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if expected == 'array':
+                if char != '[':
+                    raise ValueError('ожидается JSON-массив')
+                expected = 'first'
+                position += 1
+            elif char == ']' and expected in ('first', 'separator'):
+                return
+            elif expected == 'separator':
+                if char != ',':
+                    raise ValueError('ожидается запятая или конец массива')
+                expected = 'item'
+                position += 1
+            elif char == ']':
+                raise ValueError('лишняя запятая в конце массива')
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break
+                if char not in '{["' and (
+                    end == len(buffer) or buffer[end] not in ' \t\r\n,]'
+                ):
+                    # Число или литерал на границе куска могут
+                    # продолжиться в следующем куске.
+                    break
+                yield item
+                position = end
+                expected = 'separator'
+    raise ValueError('неожиданный конец JSON-файла')
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        name, measurement_unit = row
+        yield {'name': name, 'measurement_unit': measurement_unit}
+
+
+READERS = {
+    'json': iter_json_array,
+    'csv': iter_csv_rows,
+}
+
+
 class Command(BaseCommand):
-    help = 'Загружает ингредиенты из JSON файла в базу данных'
+    help = 'Загружает ингредиенты из JSON или CSV файла в базу данных'
 
-    def handle(self, *args, **kwargs):
-        try:
-            with open('ingredients.json', 'r', encoding='utf-8') as file:
-                created_ingredients = Ingredient.objects.bulk_create(
-                    [Ingredient(**item) for item in json.load(file)],
-                    ignore_conflicts=True
-                )
-
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Успешно добавлено {len(created_ingredients)} ингредиентов.'
-                )
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='ingredients.json')
+        parser.add_argument('--format', dest='file_format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, path, file_format, batch_size, **kwargs):
+        path = Path(path)
+        file_format = file_format or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
             )
-        except Exception as e:
-            self.stderr.write(f'Произошла ошибка: {e}')
+        reader = READERS[file_format]
+        started = perf_counter()
+        count_before = Ingredient.objects.count()
+        processed = 0
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = reader(file)
+                while batch := list(islice(rows, batch_size)):
+                    unique = {item['name']: item for item in batch}
+                    Ingredient.objects.bulk_create(
+                        [Ingredient(**item) for item in unique.values()],
+                        update_conflicts=True,
+                        unique_fields=['name'],
+                        update_fields=['measurement_unit'],
+                    )
+                    processed += len(batch)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CommandError(f'Произошла ошибка: {e}')
+        elapsed = perf_counter() - started
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed} записей: добавлено {created}, '
+            f'обновлено {processed - created} за {elapsed:.2f} с '
+            f'({processed / elapsed:.0f} записей/с).'
+        ))
@@ -0,0 +1,116 @@
+import asyncio
+from collections import Counter
+from statistics import quantiles
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер параллельными keep-alive соединениями '
+        'и выводит число запросов в секунду'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Адрес сервера, например '
+                                        'http://127.0.0.1:8000')
+        parser.add_argument(
+            '--request', action='append', dest='requests', required=True,
+            help='«МЕТОД /путь/»; {recipe} заменяется на id рецепта, '
+                 'свой для каждого соединения. Запросы выполняются по кругу.'
+        )
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--token', help='Токен для заголовка Authorization'
+        )
+        parser.add_argument('--host', default='localhost',
+                            help='Значение заголовка Host')
+
+    def handle(self, *args, url, requests, concurrency, duration, token,
+               host, **kwargs):
+        address = urlsplit(url)
+        recipe_ids = list(
+            Recipe.objects.order_by('id').values_list('id', flat=True)[
+                :concurrency
+            ]
+        )
+        if len(recipe_ids) < concurrency:
+            raise CommandError(
+                'Рецептов меньше, чем соединений: запустите seed_data.'
+            )
+        headers = f'Host: {host}\r\nContent-Length: 0\r\n'
+        if token:
+            headers += f'Authorization: Token {token}\r\n'
+        timings = []
+        statuses = Counter()
+
+        async def worker(recipe_id, deadline):
+            messages = [
+                f'{method} {path.format(recipe=recipe_id)} HTTP/1.1\r\n'
+                f'{headers}\r\n'.encode()
+                for method, path in (
+                    request.split(maxsplit=1) for request in requests
+                )
+            ]
+            number = 0
+            writer = None
+            while perf_counter() < deadline:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(
+                        address.hostname, address.port or 80
+                    )
+                started = perf_counter()
+                writer.write(messages[number % len(messages)])
+                number += 1
+                try:
+                    statuses[await read_response(reader)] += 1
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # Сервер закрыл соединение, например при перезапуске
+                    # воркера: запрос считается ошибкой.
+                    statuses['error'] += 1
+                    writer = None
+                    continue
+                timings.append(perf_counter() - started)
+            if writer is not None:
+                writer.close()
+
+        async def run():
+            deadline = perf_counter() + duration
+            await asyncio.gather(*(
+                worker(recipe_id, deadline) for recipe_id in recipe_ids
+            ))
+
+        started = perf_counter()
+        asyncio.run(run())
+        elapsed = perf_counter() - started
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{len(timings)} запросов за {elapsed:.1f} с: '
+            f'{len(timings) / elapsed:.0f} запросов/с, '
+            f'p50 {percentiles[49] * 1000:.1f} мс, '
+            f'p99 {percentiles[98] * 1000:.1f} мс, '
+            f'статусы {dict(statuses)}'
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполняет ленты подписок: последние рецепты всех авторов, '
+        'кроме знаменитостей'
+    )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            count = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты подписок: {count} записей.'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipes.models import (
+    FavoriteRecipe, Recipe, ShoppingCart, Subscription, User
+)
+
+COUNTERS = (
+    (Recipe, (
+        ('favorites_count', FavoriteRecipe, 'recipe_id'),
+        ('shopping_cart_count', ShoppingCart, 'recipe_id'),
+    )),
+    (User, (
+        ('recipes_count', Recipe, 'author_id'),
+        ('subscriptions_count', Subscription, 'user_id'),
+        ('subscribers_count', Subscription, 'author_id'),
+    )),
+)
+
+
+def build_recount_sql(model, counters):
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = [connection.ops.quote_name(field) for field, _, _ in counters]
+    joins = '\n'.join(
+        f'LEFT JOIN (SELECT {fk} AS id, COUNT(*) AS value '
+        f'FROM {connection.ops.quote_name(related._meta.db_table)} '
+        f'GROUP BY {fk}) AS c{index} ON c{index}.id = t.id'
+        for index, (_, related, fk) in enumerate(counters)
+    )
+    values = ', '.join(
+        f'COALESCE(c{index}.value, 0) AS {column}'
+        for index, column in enumerate(columns)
+    )
+    return (
+        f'UPDATE {table} SET '
+        + ', '.join(f'{column} = a.{column}' for column in columns)
+        + f' FROM (SELECT t.id, {values} FROM {table} AS t\n{joins}) AS a'
+        + f' WHERE {table}.id = a.id AND ('
+        + ' OR '.join(f'{table}.{column} <> a.{column}' for column in columns)
+        + ')'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов, избранного и подписок'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, counters in COUNTERS:
+                cursor.execute(build_recount_sql(model, counters))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural}: '
+                    f'исправлено {cursor.rowcount} записей.'
+                ))
@@ -0,0 +1,35 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.popular import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет новые записи избранного и списков покупок в почасовые '
+        'счётчики популярных рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Повторять агрегацию, пока команду не остановят'
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.POPULAR_ROLLUP_INTERVAL,
+            help='Пауза между запусками в режиме --loop, секунды'
+        )
+
+    def handle(self, *args, loop, interval, **kwargs):
+        while True:
+            # Версии кеша ответов здесь не меняются: кеш у каждого
+            # процесса свой, и ответ обновится через
+            # RESPONSE_CACHE_TIMEOUT.
+            updated = rollup()
+            self.stdout.write(f'Популярные рецепты: {updated} счётчиков.')
+            if not loop:
+                break
+            sleep(interval)
@@ -0,0 +1,96 @@
+import random
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import (
+    FavoriteRecipe, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Subscription, User
+)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу тестовыми данными для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Сначала загрузите продукты командой download_ingredients.'
+            )
+        token = uuid4().hex[:8]
+        password = make_password('password')
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    email=f'seed-{token}-{index}@example.com',
+                    username=f'seed-{token}-{index}',
+                    first_name='Тест',
+                    last_name=str(index),
+                    password=password,
+                )
+                for index in range(options['users'])
+            ], batch_size=batch_size)
+            user_ids = [user.id for user in users]
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'Рецепт {token} {index}',
+                    text='Тестовый рецепт для нагрузочного тестирования.',
+                    image='recipes/images/seed.png',
+                    cooking_time=rng.randint(5, 180),
+                )
+                for index in range(options['recipes'])
+            ], batch_size=batch_size)
+            recipe_ids = [recipe.id for recipe in recipes]
+            per_recipe = min(
+                options['ingredients_per_recipe'], len(ingredient_ids)
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(ingredient_ids, per_recipe)
+            ], batch_size=batch_size)
+            for model, option, pool in (
+                (FavoriteRecipe, 'favorites_per_user', recipe_ids),
+                (ShoppingCart, 'cart_per_user', recipe_ids),
+            ):
+                model.objects.bulk_create([
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(
+                        pool, min(options[option], len(pool))
+                    )
+                ], batch_size=batch_size, ignore_conflicts=True)
+            Subscription.objects.bulk_create([
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in rng.sample(user_ids, min(
+                    options['subscriptions_per_user'], len(user_ids)
+                ))
+                if author_id != user_id
+            ], batch_size=batch_size, ignore_conflicts=True)
+        call_command('recount', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {len(user_ids)} пользователей и {len(recipe_ids)} '
+            f'рецептов (метка {token}).'
+        ))
@@ -0,0 +1,38 @@
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+from recipes.models import SEARCH_CONFIG, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Заполняет поисковые векторы рецептов пакетами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='Обновлять только рецепты без поискового вектора'
+        )
+
+    def handle(self, *args, batch_size, missing_only, **kwargs):
+        recipes = Recipe.objects.order_by('pk')
+        if missing_only:
+            recipes = recipes.filter(search_vector__isnull=True)
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk).values_list(
+                'pk', flat=True
+            )[:batch_size])
+            if not batch:
+                break
+            updated += Recipe.objects.filter(
+                pk__gt=last_pk, pk__lte=batch[-1]
+            ).update(search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            ))
+            last_pk = batch[-1]
+            self.stdout.write(f'Обработано {updated} рецептов...')
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы обновлены для {updated} рецептов.'
+        ))
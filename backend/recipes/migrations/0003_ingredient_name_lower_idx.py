@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-18 03:02
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_alter_favoriterecipe_recipe_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('name'), name='text_pattern_ops'), name='ingredient_name_lower_idx'),
+        ),
+    ]
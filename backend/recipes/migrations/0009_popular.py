@@ -0,0 +1,45 @@
+# Generated by Django 4.2.17 on 2026-10-18 03:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=64, unique=True, verbose_name='Таблица')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний учтённый id')),
+            ],
+            options={
+                'verbose_name': 'Позиция агрегации',
+                'verbose_name_plural': 'Позиции агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало часа')),
+                ('favorites', models.PositiveIntegerField(verbose_name='Добавления в избранное')),
+                ('shopping_carts', models.PositiveIntegerField(verbose_name='Добавления в список покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Активность по рецепту',
+                'verbose_name_plural': 'Активность по рецептам',
+                'indexes': [models.Index(fields=['bucket'], name='recipe_activity_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeactivity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'bucket'), name='unique_recipe_activity_bucket'),
+        ),
+    ]
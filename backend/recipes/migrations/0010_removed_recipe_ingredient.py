@@ -0,0 +1,51 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:07
+
+from django.db import migrations, models
+
+
+CREATE_TRIGGER = '''
+CREATE FUNCTION recipes_recipeingredient_log_delete() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO recipes_removedrecipeingredient
+        (recipe_id, ingredient_id, removed_at)
+    SELECT recipe_id, ingredient_id, now() FROM removed;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipeingredient_log_delete_trigger
+AFTER DELETE ON recipes_recipeingredient
+REFERENCING OLD TABLE AS removed
+FOR EACH STATEMENT EXECUTE FUNCTION recipes_recipeingredient_log_delete();
+'''
+
+DROP_TRIGGER = '''
+DROP TRIGGER IF EXISTS recipes_recipeingredient_log_delete_trigger
+    ON recipes_recipeingredient;
+DROP FUNCTION IF EXISTS recipes_recipeingredient_log_delete();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_popular'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemovedRecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(verbose_name='Рецепт')),
+                ('ingredient_id', models.BigIntegerField(verbose_name='Продукт')),
+                ('removed_at', models.DateTimeField(verbose_name='Удалено')),
+            ],
+            options={
+                'verbose_name': 'Удалённый продукт рецепта',
+                'verbose_name_plural': 'Удалённые продукты рецептов',
+                'indexes': [models.Index(fields=['removed_at'], name='removed_ingredient_at_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
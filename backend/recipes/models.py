@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Lower, RowNumber
 from django.conf import settings
 from django.core.validators import MinValueValidator, RegexValidator
 from django.contrib.auth.models import AbstractUser
@@ -6,6 +9,7 @@ from django.contrib.auth.models import AbstractUser
 
 MIN_COOKING_TIME = 1
 MIN_AMOUNT = 1
+SEARCH_CONFIG = 'russian'
 
 
 class User(AbstractUser):
@@ -35,6 +39,18 @@ class User(AbstractUser):
         null=True,
         blank=True
     )
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецепты', default=0, editable=False
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        'Подписки', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчики', default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -88,11 +104,64 @@ class Ingredient(models.Model):
                 name='unique_ingredient_measurement'
             )
         ]
+        indexes = [
+            models.Index(
+                OpClass(Lower('name'), name='text_pattern_ops'),
+                name='ingredient_name_lower_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_ingredients(self):
+        return self.prefetch_related(models.Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient'
+            ).only(
+                'recipe_id', 'amount',
+                'ingredient__name', 'ingredient__measurement_unit',
+            ).order_by('id')
+        ))
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+        )
+
+    def for_response(self, user):
+        return self.with_ingredients().with_user_flags(user)
+
+    def latest_by_author(self, author_ids, limit=None):
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return recipes
+        return recipes.annotate(
+            author_row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author_id'),
+                order_by=models.F('created_at').desc(),
+            )
+        ).filter(author_row_number__lte=limit)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -102,6 +171,9 @@ class Recipe(models.Model):
     )
     name = models.CharField('Название', max_length=256)
     image = models.ImageField('Картинка', upload_to='recipes/images/')
+    image_variants = models.JSONField(
+        'Варианты картинки', default=dict, editable=False
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -115,11 +187,33 @@ class Recipe(models.Model):
         validators=(MinValueValidator(MIN_COOKING_TIME),)
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='recipe_author_created_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -154,6 +248,24 @@ class RecipeIngredient(models.Model):
         verbose_name_plural = 'Продукты рецепта'
 
 
+class RemovedRecipeIngredient(models.Model):
+    # Журнал удалённых строк RecipeIngredient, заполняется триггером базы.
+    # По нему индекс рецептов по продуктам в каждом процессе узнаёт
+    # об удалениях, сделанных другими процессами.
+    recipe_id = models.BigIntegerField('Рецепт')
+    ingredient_id = models.BigIntegerField('Продукт')
+    removed_at = models.DateTimeField('Удалено')
+
+    class Meta:
+        verbose_name = 'Удалённый продукт рецепта'
+        verbose_name_plural = 'Удалённые продукты рецептов'
+        indexes = [
+            models.Index(
+                fields=['removed_at'], name='removed_ingredient_at_idx'
+            ),
+        ]
+
+
 class UserRecipeRelation(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -191,3 +303,79 @@ class ShoppingCart(UserRecipeRelation):
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedEntry(models.Model):
+    # Лента подписок, заполняемая при публикации рецепта. created_at
+    # копируется из рецепта, чтобы страница читалась по одному индексу.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    created_at = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='feed_entry_user_created_idx'
+            ),
+        ]
+
+
+class RecipeActivity(models.Model):
+    # Сколько раз рецепт добавили в избранное и в список покупок за час,
+    # заполняется командой rollup_popular.
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт',
+    )
+    bucket = models.DateTimeField('Начало часа')
+    favorites = models.PositiveIntegerField('Добавления в избранное')
+    shopping_carts = models.PositiveIntegerField(
+        'Добавления в список покупок'
+    )
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'bucket'],
+                name='unique_recipe_activity_bucket'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='recipe_activity_bucket_idx'),
+        ]
+
+
+class RollupPosition(models.Model):
+    # Наибольший id строки источника, уже учтённой в RecipeActivity.
+    source = models.CharField('Таблица', max_length=64, unique=True)
+    last_id = models.BigIntegerField('Последний учтённый id', default=0)
+
+    class Meta:
+        verbose_name = 'Позиция агрегации'
+        verbose_name_plural = 'Позиции агрегации'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    FavoriteRecipe, RecipeActivity, RollupPosition, ShoppingCart
+)
+from .sql import quote
+
+# Популярные рецепты считаются по почасовым счётчикам RecipeActivity.
+# Команда rollup_popular переносит в них только строки избранного и списков
+# покупок с id больше запомненного, поэтому чтение не агрегирует таблицы
+# связей целиком.
+
+SOURCES = {
+    FavoriteRecipe: 'favorites',
+    ShoppingCart: 'shopping_carts',
+}
+
+
+def rollup_source(cursor, model, bucket):
+    # Строки, вставленные ещё не завершёнными транзакциями с id меньше
+    # максимального, будут пропущены. Добавление в избранное — одиночная
+    # короткая команда, и для рейтинга такая потеря допустима.
+    position, _ = RollupPosition.objects.select_for_update().get_or_create(
+        source=model._meta.db_table
+    )
+    cursor.execute(f'SELECT max(id) FROM {quote(model)}')
+    last_id = cursor.fetchone()[0]
+    if last_id is None or last_id <= position.last_id:
+        return 0
+    column = SOURCES[model]
+    counts = ', '.join(
+        'count(*)' if name == column else '0' for name in SOURCES.values()
+    )
+    activity = quote(RecipeActivity)
+    cursor.execute(
+        f'INSERT INTO {activity} (recipe_id, bucket, '
+        f'{", ".join(SOURCES.values())}) '
+        f'SELECT recipe_id, %s, {counts} FROM {quote(model)} '
+        f'WHERE id > %s AND id <= %s GROUP BY recipe_id '
+        f'ON CONFLICT (recipe_id, bucket) DO UPDATE '
+        f'SET {column} = {activity}.{column} + EXCLUDED.{column}',
+        [bucket, position.last_id, last_id]
+    )
+    position.last_id = last_id
+    position.save(update_fields=['last_id'])
+    return cursor.rowcount
+
+
+def rollup(now=None):
+    # У связей нет времени создания, поэтому новые строки относятся к часу,
+    # в котором выполняется агрегация.
+    now = now or timezone.now()
+    bucket = now.replace(minute=0, second=0, microsecond=0)
+    updated = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in SOURCES:
+            updated += rollup_source(cursor, model, bucket)
+        RecipeActivity.objects.filter(
+            bucket__lt=bucket - timedelta(days=settings.POPULAR_WINDOW_DAYS)
+        ).delete()
+    return updated
+
+
+def get_popular(limit, now=None):
+    # id рецептов по убыванию суммы добавлений, каждый час которых
+    # весит вдвое меньше каждые POPULAR_HALF_LIFE_HOURS часов.
+    now = now or timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT recipe_id FROM {quote(RecipeActivity)} '
+            f'WHERE bucket >= %s GROUP BY recipe_id '
+            f'ORDER BY sum((favorites + shopping_carts) * power(0.5, '
+            f'extract(epoch FROM %s - bucket) / 3600 / %s)) DESC, '
+            f'recipe_id DESC LIMIT %s',
+            [now - timedelta(days=settings.POPULAR_WINDOW_DAYS), now,
+             settings.POPULAR_HALF_LIFE_HOURS, limit]
+        )
+        return [recipe_id for recipe_id, in cursor.fetchall()]
@@ -0,0 +1,122 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .feed import add_author_to_feed, fan_out_recipes, remove_author_from_feed
+from .models import FavoriteRecipe, Recipe, ShoppingCart, Subscription, User
+
+
+COUNTER_CHANGES = '_counter_changes'
+
+
+def change_counter(model, pk, field, delta):
+    model.objects.filter(
+        pk=pk, **{f'{field}__gte': -delta}
+    ).update(**{field: F(field) + delta})
+
+
+def decrement_counter(instance, origin, model, pk, field):
+    # При каскадном удалении рецепта или пользователя post_delete приходит
+    # для каждой связи. Тогда изменения копятся на объекте, с которого
+    # началось удаление, и применяются сгруппированно в его post_delete,
+    # а счётчики самого удаляемого объекта не трогаются.
+    if getattr(origin, 'model', type(origin)) is type(instance):
+        change_counter(model, pk, field, -1)
+    elif not (isinstance(origin, model) and origin.pk == pk):
+        vars(origin).setdefault(COUNTER_CHANGES, Counter())[
+            model, field, pk
+        ] += 1
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_recipes([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, origin, **kwargs):
+    decrement_counter(instance, origin, User, instance.author_id,
+                      'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def apply_counter_changes(instance, origin, **kwargs):
+    # Связи удаляются раньше объекта, с которого началось удаление.
+    if getattr(origin, 'model', type(origin)) is not type(instance):
+        return
+    changes = vars(origin).pop(COUNTER_CHANGES, None)
+    if not changes:
+        return
+    grouped = defaultdict(list)
+    for (model, field, pk), delta in changes.items():
+        grouped[model, field, delta].append(pk)
+    for (model, field, delta), pks in grouped.items():
+        model.objects.filter(
+            pk__in=pks, **{f'{field}__gte': delta}
+        ).update(**{field: F(field) - delta})
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def decrement_favorites_count(instance, origin, **kwargs):
+    decrement_counter(instance, origin, Recipe, instance.recipe_id,
+                      'favorites_count')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_shopping_cart_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'shopping_cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_shopping_cart_count(instance, origin, **kwargs):
+    decrement_counter(instance, origin, Recipe, instance.recipe_id,
+                      'shopping_cart_count')
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscription_counts(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.user_id, 'subscriptions_count', 1)
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscription_counts(instance, origin, **kwargs):
+    decrement_counter(instance, origin, User, instance.user_id,
+                      'subscriptions_count')
+    decrement_counter(instance, origin, User, instance.author_id,
+                      'subscribers_count')
+
+
+@receiver(post_save, sender=Subscription)
+def add_subscription_to_feed(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: add_author_to_feed(
+            instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_subscription_from_feed(instance, origin, **kwargs):
+    # Подписка удаляется каскадом только вместе с пользователем: записи
+    # его ленты или рецепты автора удалит тот же каскад.
+    if getattr(origin, 'model', type(origin)) is Subscription:
+        remove_author_from_feed(instance.user_id, instance.author_id)
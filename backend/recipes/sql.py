@@ -0,0 +1,6 @@
+from django.db import connection
+
+
+def quote(model):
+    # Имя таблицы модели для сырых SQL-запросов.
+    return connection.ops.quote_name(model._meta.db_table)
@@ -0,0 +1,172 @@
+from base64 import b64encode
+from io import BytesIO, StringIO
+from tempfile import mkdtemp
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .management.commands.download_ingredients import iter_json_array
+from .models import (
+    FavoriteRecipe, Ingredient, Recipe, RecipeIngredient, ShoppingCart, User
+)
+
+
+def create_recipes(author, ingredients, count):
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            author=author,
+            name=f'Рецепт {index}',
+            text='Описание',
+            image='recipes/images/test.png',
+            cooking_time=10,
+        )
+        for index in range(count)
+    ])
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in ingredients
+    ])
+    return recipes
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class RecipeQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Продукт {index}', measurement_unit='г')
+            for index in range(3)
+        ])
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def mark_recipes(self, recipes):
+        FavoriteRecipe.objects.bulk_create([
+            FavoriteRecipe(user=self.user, recipe=recipe)
+            for recipe in recipes[::2]
+        ])
+        ShoppingCart.objects.bulk_create([
+            ShoppingCart(user=self.user, recipe=recipe)
+            for recipe in recipes[::3]
+        ])
+
+    def count_list_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_queries_do_not_depend_on_recipe_count(self):
+        self.mark_recipes(create_recipes(self.user, self.ingredients, 1))
+        counts = {
+            'anonymous': self.count_list_queries(self.anonymous),
+            'authenticated': self.count_list_queries(self.client),
+        }
+        self.mark_recipes(create_recipes(self.user, self.ingredients, 99))
+        for name, client in (
+            ('anonymous', self.anonymous), ('authenticated', self.client)
+        ):
+            with self.subTest(name), self.assertNumQueries(counts[name]):
+                self.assertEqual(
+                    client.get('/api/recipes/').status_code, 200
+                )
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0, MEDIA_ROOT=mkdtemp())
+class RecipeQueryBudgetTest(TestCase):
+    # Ответы читаются через RecipeQuerySet.for_response: рецепт, флаги
+    # пользователя и продукты одним запросом с предзагрузкой.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password', first_name='Имя', last_name='Фамилия',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Продукт {index}', measurement_unit='г')
+            for index in range(3)
+        ])
+        cls.recipe, *_ = create_recipes(cls.user, cls.ingredients, 10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_payload(self):
+        image = BytesIO()
+        Image.new('RGB', (1, 1)).save(image, 'PNG')
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': 'data:image/png;base64,'
+                     + b64encode(image.getvalue()).decode(),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 2}
+                for ingredient in self.ingredients[:2]
+            ],
+        }
+
+    def test_list(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                '/api/recipes/', self.get_payload(), format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['ingredients']), 2)
+
+    def test_update(self):
+        with self.assertNumQueries(11):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/', self.get_payload(),
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['ingredients']), 2)
+
+
+class IterJsonArrayTest(SimpleTestCase):
+    def read(self, text, chunk_size):
+        return list(iter_json_array(StringIO(text), chunk_size))
+
+    def test_values_split_across_chunks(self):
+        text = '[12345, -1.5e+10, true, null, "a,]", {"name": "b"}, []]'
+        for chunk_size in (1, 2, 3, 5, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    self.read(text, chunk_size),
+                    [12345, -1.5e+10, True, None, 'a,]', {'name': 'b'}, []]
+                )
+
+    def test_invalid_arrays(self):
+        for text in (
+            '[{"name": "a"},', '[1', '', '[1,]', '[1 2]', '{"name": "a"}'
+        ):
+            for chunk_size in (1, 2, 64):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.read(text, chunk_size)
@@ -1,6 +1,10 @@
-from django.shortcuts import redirect, get_object_or_404
+from django.http import Http404
+from django.shortcuts import redirect
+
 from .models import Recipe
 
-def recipe_redirect_view(request, recipe_id):
-    recipe = get_object_or_404(Recipe, pk=recipe_id)
-    return redirect(f'/recipes/{recipe.id}/')
+
+async def recipe_redirect_view(request, recipe_id):
+    if not await Recipe.objects.filter(pk=recipe_id).aexists():
+        raise Http404
+    return redirect(f'/recipes/{recipe_id}/')